@@ -1,24 +1,41 @@
+import argparse
 import json
+import os
 import re
 import subprocess
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import cv2
+import numpy as np
 from PIL import Image
 
 from character_info.char_sprites import get_char_sprites, Sprite
 from utils.data_utils import sprite_root
+from utils.image_utils import image_index
 from utils.wiki_utils import save_page
 
 VENDOR_DIR = Path("vendor/groundingdino")
 CONFIG_PATH = VENDOR_DIR / "groundingdino/config/GroundingDINO_SwinT_OGC.py"
 WEIGHTS_PATH = VENDOR_DIR / "weights/groundingdino_swint_ogc.pth"
+CASCADE_DIR = Path("vendor/lbpcascade_animeface")
+CASCADE_PATH = CASCADE_DIR / "lbpcascade_animeface.xml"
 RESULT_FILE = sprite_root / "face_data.json"
+# Detections by backend and sprite content hash, so unchanged sprites are never re-run.
+CACHE_FILE = sprite_root / "face_cache.json"
 
 TEXT_PROMPT = "face"
 BOX_THRESHOLD = 0.25
 TEXT_THRESHOLD = 0.20
 
+# The cascade runs on sprites shrunk to at most this many pixels on a side.
+CASCADE_MAX_SIZE = 1024
+CASCADE_MIN_FACE = 24
+
+Box = list[int]
+
 
 def pick_representative_sprite(sprites: list[Sprite]) -> Path | None:
     if len(sprites) == 1:
@@ -29,61 +46,148 @@ def pick_representative_sprite(sprites: list[Sprite]) -> Path | None:
     return None
 
 
-def detect_faces():
-    if not VENDOR_DIR.exists():
-        subprocess.run(["git", "clone", "https://github.com/idea-research/groundingdino"], cwd=VENDOR_DIR.parent)
-    sys.path.insert(0, str(VENDOR_DIR))
-    from groundingdino.util.inference import load_model, load_image, predict
+class CascadeDetector:
+    """lbpcascade_animeface through OpenCV; CPU only and fast enough to run on every sprite."""
+
+    name = "cascade"
+
+    def __init__(self, max_workers: int | None = None):
+        if not CASCADE_PATH.exists():
+            CASCADE_DIR.parent.mkdir(parents=True, exist_ok=True)
+            subprocess.run(["git", "clone", "https://github.com/nagadomi/lbpcascade_animeface"],
+                           cwd=CASCADE_DIR.parent)
+        self.cascade_path = str(CASCADE_PATH)
+        self.max_workers = max_workers if max_workers is not None else os.cpu_count()
+        self.local = threading.local()
+
+    def detect_one(self, image_path: Path) -> Box | None:
+        if not hasattr(self.local, "cascade"):
+            self.local.cascade = cv2.CascadeClassifier(self.cascade_path)
+        with Image.open(image_path) as image:
+            rgba = image.convert("RGBA")
+        # Flatten onto white so transparent areas do not read as dark edges.
+        canvas = Image.new("RGBA", rgba.size, (255, 255, 255, 255))
+        canvas.alpha_composite(rgba)
+        gray = np.asarray(canvas.convert("L"))
+        scale = min(1.0, CASCADE_MAX_SIZE / max(gray.shape))
+        if scale < 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.equalizeHist(gray)
+        faces = self.local.cascade.detectMultiScale(
+            gray, scaleFactor=1.1, minNeighbors=5, minSize=(CASCADE_MIN_FACE, CASCADE_MIN_FACE))
+        if len(faces) == 0:
+            return None
+        x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+        return [round(x / scale), round(y / scale), round((x + w) / scale), round((y + h) / scale)]
+
+    def detect(self, image_paths: list[Path]) -> list[Box | None]:
+        # detectMultiScale releases the GIL, so threads share one process' worth of decoders.
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(self.detect_one, image_paths))
+
+
+class GroundingDinoDetector:
+    """GroundingDINO with a text prompt. Slow without a GPU, but the most reliable."""
+
+    name = "groundingdino"
+
+    def __init__(self, device: str | None = None):
+        if not VENDOR_DIR.exists():
+            subprocess.run(["git", "clone", "https://github.com/idea-research/groundingdino"], cwd=VENDOR_DIR.parent)
+        sys.path.insert(0, str(VENDOR_DIR))
+        import torch
+        from groundingdino.util.inference import load_model
+
+        if device is None:
+            device = "cuda:0" if torch.cuda.is_available() else "cpu"
+        self.device = device
+        self.model = load_model(str(CONFIG_PATH), str(WEIGHTS_PATH), device=device).to(device)
+
+    def detect(self, image_paths: list[Path]) -> list[Box | None]:
+        from groundingdino.util.inference import load_image, predict
+
+        result: list[Box | None] = []
+        for image_path in image_paths:
+            image_source, image = load_image(str(image_path))
+            boxes, logits, phrases = predict(
+                model=self.model,
+                image=image,
+                caption=TEXT_PROMPT,
+                box_threshold=BOX_THRESHOLD,
+                text_threshold=TEXT_THRESHOLD,
+                device=self.device,
+            )
+            if len(boxes) == 0:
+                result.append(None)
+                continue
+            height, width, _ = image_source.shape
+            cx, cy, bw, bh = boxes[0]
+            result.append([
+                round(((cx - bw / 2) * width).item()),
+                round(((cy - bh / 2) * height).item()),
+                round(((cx + bw / 2) * width).item()),
+                round(((cy + bh / 2) * height).item()),
+            ])
+        return result
+
+
+DETECTORS = {
+    CascadeDetector.name: CascadeDetector,
+    GroundingDinoDetector.name: GroundingDinoDetector,
+}
+
+
+def load_face_cache() -> dict[str, Box | None]:
+    if not CACHE_FILE.exists():
+        return {}
+    with open(CACHE_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
 
+def detect_faces(backend: str = CascadeDetector.name, overwrite: bool = False):
+    """Detect the face on each variant's representative sprite and save the boxes to `RESULT_FILE`.
+
+    Variants that already have a box (possibly hand-corrected) are left alone unless
+    `overwrite` is set. Results are cached by backend and sprite hash; only sprites
+    missing from the cache are handed to the detector, all in one batch.
+    """
     if RESULT_FILE.exists():
         with open(RESULT_FILE, "r", encoding="utf-8") as f:
-            result: dict[str, dict[str, list[float]]] = json.load(f)
+            result: dict[str, dict[str, Box]] = json.load(f)
     else:
         result = {}
+    cache = load_face_cache()
 
-    model = load_model(str(CONFIG_PATH), str(WEIGHTS_PATH))
-    model = model.to('cuda:0')
-
-    all_sprites = get_char_sprites()
-
-    for char_name, variants in all_sprites.items():
-        if char_name not in result:
-            result[char_name] = {}
+    targets: list[tuple[str, str, str]] = []
+    misses: dict[str, Path] = {}
+    for char_name, variants in get_char_sprites().items():
         for variant_name, sprites in variants.items():
-            if variant_name in result[char_name]:
+            if not overwrite and variant_name in result.get(char_name, {}):
                 continue
-
             image_path = pick_representative_sprite(sprites)
             if image_path is None or not image_path.exists():
                 print(f"Warning: no image for {char_name}/{variant_name}")
                 continue
-
-            image_source, image = load_image(str(image_path))
-            boxes, logits, phrases = predict(
-                model=model,
-                image=image,
-                caption=TEXT_PROMPT,
-                box_threshold=BOX_THRESHOLD,
-                text_threshold=TEXT_THRESHOLD,
-            )
-
-            if len(boxes) == 0:
-                print(f"Warning: no face detected for {char_name}/{variant_name}")
-                continue
-
-            height, width, _ = image_source.shape
-            cx, cy, bw, bh = boxes[0]
-            x1 = (cx - bw / 2) * width
-            y1 = (cy - bh / 2) * height
-            x2 = (cx + bw / 2) * width
-            y2 = (cy + bh / 2) * height
-
-            result[char_name][variant_name] = [
-                round(x1.item()),
-                round(y1.item()),
-                round(x2.item()),
-                round(y2.item()),
-            ]
+            key = f"{backend}:{image_index().info(image_path).hash}"
+            targets.append((char_name, variant_name, key))
+            if key not in cache:
+                misses[key] = image_path
+
+    if misses:
+        print(f"Detecting faces in {len(misses)} sprites with {backend}")
+        detector = DETECTORS[backend]()
+        cache.update(zip(misses, detector.detect(list(misses.values()))))
+        CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=4, sort_keys=True)
+
+    image_index().save()
+    for char_name, variant_name, key in targets:
+        box = cache[key]
+        if box is None:
+            print(f"Warning: no face detected for {char_name}/{variant_name}")
+            continue
+        result.setdefault(char_name, {})[variant_name] = box
 
     result = {k: v for k, v in result.items() if v}
 
@@ -113,11 +217,11 @@ CIRCLE_DIAMETER = 60.0
 
 def get_sprite_dimensions(char_name: str, variant_name: str) -> tuple[int, int]:
     char_dir = sprite_root / char_name
-    matches = sorted(char_dir.glob(f"{char_name}_{variant_name}_*.png"))
+    pattern = f"{char_name}_{variant_name}_*.png"
+    matches = sorted(char_dir.glob(pattern))
     if not matches:
         raise FileNotFoundError(f"No sprite image for {char_name}/{variant_name}")
-    img = Image.open(matches[0])
-    return img.size
+    return image_index().info(matches[0]).size
 
 
 def generate_face_css():
@@ -158,17 +262,24 @@ def generate_face_css():
             )
         lines.append("")
 
+    image_index().save()
     css = "\n".join(lines)
     save_page("Template:Messenger/face.css", css, "update face positioning CSS")
 
 
-def sprite_face_main():
-    detect_faces()
+def sprite_face_main(backend: str = CascadeDetector.name, overwrite: bool = False):
+    detect_faces(backend, overwrite)
     generate_face_css()
 
 
 def main():
-    sprite_face_main()
+    parser = argparse.ArgumentParser(description="Detect sprite faces and update the messenger face CSS.")
+    parser.add_argument("--backend", choices=sorted(DETECTORS), default=CascadeDetector.name,
+                        help="Face detector; groundingdino picks CUDA when available and falls back to CPU")
+    parser.add_argument("--redetect", action="store_true",
+                        help="Replace boxes already in face_data.json instead of only detecting missing ones")
+    args = parser.parse_args()
+    sprite_face_main(args.backend, args.redetect)
 
 
 if __name__ == '__main__':
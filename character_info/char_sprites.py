@@ -1,15 +1,20 @@
 import json
+import os
 import re
 import shutil
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from functools import cache
 from pathlib import Path
 
+import numpy as np
+import xxhash
 from PIL import Image
 from wikitextparser import Template, parse
 
 from character_info.characters import id_to_char, Character, get_character_pages, get_characters
 from utils.data_utils import assets_root, sprite_root, load_lua_table, lua_root
+from utils.image_utils import ImageInfo, alpha_composite, describe_file, image_index, write_image
 from utils.upload_utils import UploadRequest, process_uploads
 from utils.wiki_utils import save_json_page, set_arg, save_page, PageCreationRequest, process_page_creation_requests, \
     find_templates_by_name, find_section, force_section_text
@@ -52,52 +57,192 @@ def compute_offsets(base: SpriteData, top: SpriteData, bh: float, th: float) ->
     return int(round(off_x)), int(round(off_y))
 
 
-def compose(base: Sprite, top: Sprite, out: Path) -> None:
-    base_image = Image.open(base.source).convert("RGBA")
-    top_image = Image.open(top.source).convert("RGBA")
+# Expressions are laid out on a canvas this size with the base at the anchor;
+# anything an offset pushes past its edge is cut off.
+CANVAS_SIZE = 4096
+CANVAS_ANCHOR = 1024
 
-    canvas_size = (4096, 4096)
-    canvas_color = (0, 0, 0, 0)
 
-    anchor_x, anchor_y = 1024, 1024
-    canvas1 = Image.new("RGBA", canvas_size, canvas_color)
-    canvas1.paste(base_image, (anchor_x, anchor_y))
+def _load_rgba(path: Path) -> np.ndarray:
+    with Image.open(path) as image:
+        return np.asarray(image.convert("RGBA"))
 
-    if base_image.size == top_image.size:
+
+def compose_layers(base_image: np.ndarray, base: Sprite, top: Sprite) -> np.ndarray:
+    """The expression `top` drawn over the decoded `base`, trimmed to its alpha.
+
+    Only the rectangle both layers span is allocated, rather than a full canvas
+    per layer, and only where the expression lies is anything blended.
+    """
+    top_image = _load_rgba(top.source)
+    base_height, base_width = base_image.shape[:2]
+    top_height, top_width = top_image.shape[:2]
+    if (base_width, base_height) == (top_width, top_height):
         off_x, off_y = 0, 0
     else:
-        base_height = base_image.size[1]
-        top_height = top_image.size[1]
         off_x, off_y = compute_offsets(base.json_data, top.json_data, base_height, top_height)
-    canvas2 = Image.new("RGBA", canvas_size, canvas_color)
-    canvas2.paste(top_image, (anchor_x + off_x, anchor_y + off_y))
-
-    combined = Image.alpha_composite(canvas1, canvas2)
-    bbox = combined.getbbox()
-    if bbox:
-        combined = combined.crop(bbox)
-    combined.save(out)
-    print(f"Saved {out}")
 
-
-def process_assets(sprites: list[Sprite], char: Character, variant_name: str) -> None:
+    # Layer rectangles in canvas coordinates, clipped to the canvas.
+    base_box = (CANVAS_ANCHOR, CANVAS_ANCHOR, CANVAS_ANCHOR + base_width, CANVAS_ANCHOR + base_height)
+    top_box = (CANVAS_ANCHOR + off_x, CANVAS_ANCHOR + off_y,
+               CANVAS_ANCHOR + off_x + top_width, CANVAS_ANCHOR + off_y + top_height)
+    left = max(0, min(base_box[0], top_box[0]))
+    top_edge = max(0, min(base_box[1], top_box[1]))
+    right = min(CANVAS_SIZE, max(base_box[2], top_box[2]))
+    bottom = min(CANVAS_SIZE, max(base_box[3], top_box[3]))
+    canvas = np.zeros((bottom - top_edge, right - left, 4), np.uint8)
+
+    def place(box: tuple[int, int, int, int]) -> tuple[tuple[slice, slice], tuple[slice, slice]]:
+        x0, y0 = max(box[0], left), max(box[1], top_edge)
+        x1, y1 = min(box[2], right), min(box[3], bottom)
+        return ((slice(y0 - top_edge, y1 - top_edge), slice(x0 - left, x1 - left)),
+                (slice(y0 - box[1], y1 - box[1]), slice(x0 - box[0], x1 - box[0])))
+
+    into, source = place(base_box)
+    canvas[into] = base_image[source]
+    alpha_composite(canvas, top_image, top_box[0] - left, top_box[1] - top_edge)
+
+    rows = np.flatnonzero(canvas[..., 3].any(axis=1))
+    if not len(rows):
+        return canvas
+    columns = np.flatnonzero(canvas[..., 3].any(axis=0))
+    return canvas[rows[0]:rows[-1] + 1, columns[0]:columns[-1] + 1]
+
+
+def compose_variant(base: Sprite, jobs: list[tuple[Sprite, Path]]) -> list[tuple[Path, ImageInfo]]:
+    """Compose every listed expression of one variant, decoding its base once.
+
+    Returns the metadata of each output for the image index.
+    """
+    base_image = _load_rgba(base.source)
+    written = []
+    for top, out in jobs:
+        written.append((out, write_image(Image.fromarray(compose_layers(base_image, base, top)), out)))
+        print(f"Saved {out}")
+    return written
+
+
+MANIFEST_FILE = sprite_root / "sprite_manifest.json"
+# Bump when a change to composition alters output pixels, to rebuild everything.
+COMPOSE_VERSION = 1
+
+
+class SpriteManifest:
+    """What each output sprite was built from: source PNG/JSON hashes and composition parameters.
+
+    An output is rebuilt when it is missing or its record no longer matches. Records
+    of new outputs are staged and only written by `save`, once the outputs exist.
+    """
+
+    def __init__(self, path: Path = MANIFEST_FILE):
+        self.path = path
+        self.entries: dict[str, dict] = {}
+        if path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                print(f"Ignoring unreadable sprite manifest {path}")
+        self.staged: dict[str, dict] = {}
+        self.hashes: dict[Path, str] = {}
+
+    def file_hash(self, path: Path) -> str:
+        if path not in self.hashes:
+            self.hashes[path] = xxhash.xxh3_64_hexdigest(path.read_bytes())
+        return self.hashes[path]
+
+    def source_hashes(self, sprite: Sprite) -> list[str]:
+        return [self.file_hash(sprite.source), self.file_hash(sprite.source.with_suffix(".json"))]
+
+    def record(self, base: Sprite, top: Sprite | None) -> dict:
+        if top is None:
+            return {"copy": self.file_hash(base.source)}
+        return {
+            "base": self.source_hashes(base),
+            "top": self.source_hashes(top),
+            "params": [CANVAS_SIZE, CANVAS_ANCHOR, COMPOSE_VERSION],
+        }
+
+    def is_current(self, out: Path, record: dict) -> bool:
+        return out.exists() and self.entries.get(out.as_posix()) == record
+
+    def stage(self, out: Path, record: dict) -> None:
+        self.staged[out.as_posix()] = record
+
+    def save(self) -> None:
+        if not self.staged:
+            return
+        self.entries.update(self.staged)
+        self.staged.clear()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=4, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+def _needs_build(out: Path, record: dict | None, manifest: SpriteManifest | None) -> bool:
+    if manifest is None:
+        return not out.exists()
+    if manifest.is_current(out, record):
+        return False
+    manifest.stage(out, record)
+    return True
+
+
+def process_assets(sprites: list[Sprite], char: Character, variant_name: str,
+                   pending: list[tuple[Sprite, list[tuple[Sprite, Path]]]] | None = None,
+                   manifest: SpriteManifest | None = None) -> None:
+    """Assign each sprite its output path and compose the ones that are out of date.
+
+    Without a `manifest` an output is out of date only if it is missing. With
+    `pending` the compositions are queued there for `compose_pending` instead of
+    run now.
+    """
     assert sprites[0].number == 1
     base = sprites[0]
     if len(sprites) == 1:
         base.number = 2
         out = base.get_sprite_path(char.name, variant_name)
         out.parent.mkdir(exist_ok=True, parents=True)
-        if not out.exists():
+        record = manifest.record(base, None) if manifest is not None else None
+        if _needs_build(out, record, manifest):
             shutil.copy(base.source, out)
+            image_index().add(out, describe_file(out))
             print(f"Saved: {out}")
         base.combined = out
         return
+    jobs: list[tuple[Sprite, Path]] = []
     for top in sprites[1:]:
         out = top.get_sprite_path(char.name, variant_name)
         out.parent.mkdir(parents=True, exist_ok=True)
-        if not out.exists():
-            compose(base, top, out)
+        record = manifest.record(base, top) if manifest is not None else None
+        if _needs_build(out, record, manifest):
+            jobs.append((top, out))
         top.combined = out
+    if not jobs:
+        return
+    if pending is None:
+        for path, info in compose_variant(base, jobs):
+            image_index().add(path, info)
+    else:
+        pending.append((base, jobs))
+
+
+def compose_pending(pending: list[tuple[Sprite, list[tuple[Sprite, Path]]]],
+                    max_workers: int | None = None) -> None:
+    """Run queued compositions, one variant per task so its base is decoded once.
+
+    The outputs are added to the image index as they come back from the workers.
+    """
+    if not pending:
+        return
+    if max_workers is None:
+        max_workers = max(os.cpu_count() - 4, 4)
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+        for future in [executor.submit(compose_variant, base, jobs) for base, jobs in pending]:
+            for path, info in future.result():
+                image_index().add(path, info)
 
 
 def retrieve_sprite_json_data(f: Path) -> SpriteData | None:
@@ -162,7 +307,9 @@ def find_sprites_in_dir(variant_dir: Path, variant_name: str) -> list[Sprite]:
     return sprites
 
 
-def process_char_sprites(char: Character | AvgCharacter, char_dir: Path) -> dict[str, list[Sprite]]:
+def process_char_sprites(char: Character | AvgCharacter, char_dir: Path,
+                         pending: list[tuple[Sprite, list[tuple[Sprite, Path]]]] | None = None,
+                         manifest: SpriteManifest | None = None) -> dict[str, list[Sprite]]:
     image_dir = char_dir / "atlas_png"
     images: dict[str, list[Sprite]] = {}
     for variant_dir in image_dir.iterdir():
@@ -173,7 +320,7 @@ def process_char_sprites(char: Character | AvgCharacter, char_dir: Path) -> dict
         if len(sprites) == 0:
             continue
         images[variant_name] = sprites
-        process_assets(sprites, char, variant_name)
+        process_assets(sprites, char, variant_name, pending, manifest)
     return images
 
 
@@ -181,6 +328,8 @@ def export_sprites() -> dict[str, dict[str, list[Sprite]]]:
     root = assets_root / "actor2d/characteravg"
     avg_chars, reuse_table = get_avg_characters()
     char_sprites: dict[str, dict[str, list[Sprite]]] = {}
+    pending: list[tuple[Sprite, list[tuple[Sprite, Path]]]] = []
+    manifest = SpriteManifest()
     for char_dir in sorted(root.iterdir(), key=lambda p: p.name):
         if not char_dir.is_dir():
             continue
@@ -198,7 +347,7 @@ def export_sprites() -> dict[str, dict[str, list[Sprite]]]:
             char = AvgCharacter(char_dir.name, char_dir.name)
         if char.name in char_sprites:
             continue
-        char_sprites[char.name] = process_char_sprites(char, char_dir)
+        char_sprites[char.name] = process_char_sprites(char, char_dir, pending, manifest)
     root2 = assets_root / "actor2d/character"
     assert root2.exists()
     for char_name, char in get_characters().items():
@@ -210,7 +359,10 @@ def export_sprites() -> dict[str, dict[str, list[Sprite]]]:
             if len(sprites) == 0:
                 continue
             char_sprites[char.name][variant_name] = sprites
-            process_assets(sprites, char, variant_name)
+            process_assets(sprites, char, variant_name, pending, manifest)
+    compose_pending(pending)
+    manifest.save()
+    image_index().save()
     return char_sprites
 
 
@@ -1,18 +1,31 @@
+import os
+import pickle
 import re
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from functools import cache
+from functools import cache, lru_cache
+from pathlib import Path
 from typing import Any
 
-from pywikibot import FilePage
+import xxhash
+from pywikibot import FilePage, Page
+from pywikibot.pagegenerators import PreloadingGenerator
 from wikitextparser import parse
 
 from character_info.char_sprites import get_avg_characters
-from character_info.char_story import get_story_pages
 from character_info.characters import get_characters, Character, id_to_char
-from utils.data_utils import lua_root, assets_root, load_lua_table
+from utils.data_utils import lua_root, assets_root, load_lua_table, lua_path
 from utils.text_utils import escape_text
 from utils.upload_utils import UploadRequest, process_uploads
-from utils.wiki_utils import s, force_section_text, save_page
+from utils.wiki_utils import s, force_section_text, published_pages, save_page
+
+PM_ROOT = "game/ui/avg/_en/config/"
+# Bump when parsing changes, to invalidate every cached parse.
+MESSAGE_PARSER_VERSION = 1
+MESSAGE_CACHE_DIR = Path("assets") / "message_cache"
+# Lua tables besides the characters' own that the parsed messages depend on.
+MESSAGE_CONTEXT_TABLES = ("game/ui/avg/_en/preset/avguitext.lua",)
+CHARACTERS_PER_TASK = 4
 
 
 class MessengerRow:
@@ -55,11 +68,20 @@ def get_character_sex_strings() -> dict[str, list[str]]:
     return data["SEX"]
 
 
+_SEX_MARKER = re.compile(r"==SEX\d*==")
+
+
+@cache
+def get_sex_marker_texts() -> dict[str, str]:
+    return {marker: "/".join(values) for marker, values in get_character_sex_strings().items()}
+
+
+@lru_cache(maxsize=1 << 14)
 def process_text(text: str) -> str:
-    sex_dict = get_character_sex_strings()
-    text, _ = re.subn(r"==SEX\d*==", lambda m: "/".join(sex_dict[m.group(0)]), text)
-    text = escape_text(text)
-    return text
+    if "==SEX" in text:
+        sex_texts = get_sex_marker_texts()
+        text = _SEX_MARKER.sub(lambda m: sex_texts[m.group(0)], text)
+    return escape_text(text)
 
 
 def parse_private_messages(char: Character, data: list[dict[str, Any]]) -> CharacterMessages:
@@ -181,20 +203,113 @@ def conversation_to_template(conversation: MessengerConversation) -> str:
     return "\n".join(result)
 
 
-def get_private_messages() -> dict[str, CharacterMessages]:
-    pm_root = "game/ui/avg/_en/config/"
-    result: dict[str, CharacterMessages] = {}
-    for char_name, char in get_characters().items():
-        data = []
-        for i in range(1, 3):
-            pm_path = pm_root + f"pm{char.id}0{i}.lua"
-            d = load_lua_table(pm_path)
-            if d is not None:
-                data.extend(d)
-        assert len(data) >= 10
-        messages = parse_private_messages(char, data)
-        result[char_name] = messages
-    return result
+def private_message_files(char: Character) -> list[str]:
+    return [PM_ROOT + f"pm{char.id}0{i}.lua" for i in range(1, 3)]
+
+
+def load_private_message_data(char: Character) -> list[dict[str, Any]]:
+    data = []
+    for pm_path in private_message_files(char):
+        d = load_lua_table(pm_path)
+        if d is not None:
+            data.extend(d)
+    assert len(data) >= 10
+    return data
+
+
+@cache
+def _message_context_fingerprint() -> str:
+    """Everything besides a character's own Lua files that parsing their messages depends on."""
+    digest = xxhash.xxh3_64(str(MESSAGE_PARSER_VERSION).encode())
+    for file_name in MESSAGE_CONTEXT_TABLES:
+        path = lua_path(file_name)
+        digest.update(path.read_bytes() if path is not None else b"")
+    # Speaker names come from the character table.
+    digest.update(";".join(f"{c.id}={c.name}" for c in get_characters().values()).encode())
+    return digest.hexdigest()
+
+
+def _message_cache_key(char: Character) -> str:
+    digest = xxhash.xxh3_64()
+    for pm_path in private_message_files(char):
+        path = lua_path(pm_path)
+        digest.update(path.read_bytes() if path is not None else b"")
+    return f"{_message_context_fingerprint()}:{digest.hexdigest()}"
+
+
+def _read_cached_messages(char: Character, key: str) -> list[MessengerConversation] | None:
+    path = MESSAGE_CACHE_DIR / f"pm{char.id}.pickle"
+    if not path.exists():
+        return None
+    try:
+        with open(path, "rb") as f:
+            cached_key, conversations = pickle.load(f)
+    except Exception:
+        return None
+    return conversations if cached_key == key else None
+
+
+def _write_cached_messages(char: Character, key: str, conversations: list[MessengerConversation]) -> None:
+    MESSAGE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = MESSAGE_CACHE_DIR / f"pm{char.id}.pickle"
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump((key, conversations), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def render_private_message_section(messages: CharacterMessages, signature: str) -> str:
+    result = ["''" + signature + "''"]
+    for index, conversation in enumerate(messages.messages, 1):
+        lines = [
+            "{{ToggleChat",
+            f"|Conversation {index}",
+            "|" + conversation_to_template(conversation),
+            "}}"
+        ]
+        result.append("\n".join(lines))
+    return "\n\n".join(result)
+
+
+def _parse_and_render(char: Character, signature: str) -> tuple[CharacterMessages, str]:
+    messages = parse_private_messages(char, load_private_message_data(char))
+    return messages, render_private_message_section(messages, signature)
+
+
+def _build_private_messages(jobs: int | None) -> list[tuple[Character, CharacterMessages, str]]:
+    """(character, messages, rendered section) for every character, in character order.
+
+    Each parse is cached under the hash of the character's Lua files and
+    `_message_context_fingerprint`. Cache misses are parsed and rendered together in
+    worker processes; cached characters are only rendered here.
+    """
+    signatures = get_private_message_sig()
+    characters = list(get_characters().values())
+    keys = {char.id: _message_cache_key(char) for char in characters}
+    results: dict[int, tuple[CharacterMessages, str]] = {}
+    misses = []
+    for char in characters:
+        conversations = _read_cached_messages(char, keys[char.id])
+        if conversations is None:
+            misses.append(char)
+            continue
+        messages = CharacterMessages(char, conversations)
+        results[char.id] = messages, render_private_message_section(messages, signatures[char.name])
+
+    if misses:
+        print(f"Parsing private messages of {len(misses)} characters ({len(results)} cached)")
+    miss_signatures = [signatures[char.name] for char in misses]
+    workers = min(jobs or max(os.cpu_count() - 4, 4), len(misses) // CHARACTERS_PER_TASK)
+    if workers <= 1:
+        built = map(_parse_and_render, misses, miss_signatures)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            built = list(pool.map(_parse_and_render, misses, miss_signatures, chunksize=CHARACTERS_PER_TASK))
+    for char, (messages, section) in zip(misses, built):
+        _write_cached_messages(char, keys[char.id], messages.messages)
+        # Results from workers carry their own copy of the character.
+        results[char.id] = CharacterMessages(char, messages.messages), section
+    return [(char, *results[char.id]) for char in characters]
 
 
 @cache
@@ -206,27 +321,34 @@ def get_private_message_sig() -> dict[str, str]:
     return result
 
 
-def save_private_message_pages() -> None:
-    messages = get_private_messages()
-    signatures = get_private_message_sig()
-    for char, page in get_story_pages().items():
-        parsed = parse(page.text)
-        result = ["''" + signatures[char.name] + "''"]
-        if char.name not in messages:
-            continue
-        for index, conversation in enumerate(messages[char.name].messages, 1):
-            lines = [
-                "{{ToggleChat",
-                f"|Conversation {index}",
-                "|" + conversation_to_template(conversation),
-                "}}"
-            ]
-            result.append("\n".join(lines))
-        force_section_text(parsed,
-                           section_title="Heartlink chat",
-                           text="\n\n".join(result),
-                           prepend="Invitation stories")
-        save_page(page, str(parsed), summary="Update Heartlink chat")
+def save_private_message_pages(jobs: int | None = None) -> None:
+    """Render every character's Heartlink chat section and save the ones that changed.
+
+    Sections identical to what was last published are skipped without touching the wiki;
+    the pages of the rest are fetched in one batch and saved one after another.
+    """
+    published = published_pages()
+    changed: dict[str, tuple[str, str]] = {}
+    for char, _, section in _build_private_messages(jobs):
+        published_key = f"{char.name}/story#Heartlink chat"
+        if not published.is_current(published_key, section):
+            changed[char.name] = published_key, section
+    if not changed:
+        return
+    print(f"Saving Heartlink chat of {len(changed)} characters")
+    try:
+        for page in PreloadingGenerator(Page(s, char_name + "/story") for char_name in changed):
+            published_key, section = changed[page.title().split("/")[0]]
+            parsed = parse(page.text)
+            if not force_section_text(parsed,
+                                      section_title="Heartlink chat",
+                                      text=section,
+                                      prepend="Invitation stories"):
+                continue
+            save_page(page, str(parsed), summary="Update Heartlink chat")
+            published.record(published_key, section)
+    finally:
+        published.save()
 
 
 def upload_emojis():
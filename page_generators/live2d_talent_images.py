@@ -100,6 +100,7 @@ def generate_live2d_talent_images(
     timeout: int = 60000,
     settle: int = 1500,
     headed: bool = False,
+    jobs: int = 1,
 ) -> None:
     capture_talent_screenshots(
         root=root,
@@ -120,6 +121,7 @@ def generate_live2d_talent_images(
         timeout=timeout,
         settle=settle,
         headed=headed,
+        jobs=jobs,
     )
 
 
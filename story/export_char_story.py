@@ -1,3 +1,4 @@
+from collections.abc import Iterator
 from dataclasses import dataclass
 from functools import cache
 
@@ -12,9 +13,9 @@ from story.export_story import (
     with_tyrant_gender_selector,
 )
 from story.parse_story import (
-    load_story_config,
     normalize_story_id,
-    parse_story_config,
+    parse_story_configs,
+    story_config_exists,
     StoryEpisode,
 )
 from story.story_assets import export_story_assets
@@ -37,7 +38,7 @@ def get_char_story_entries() -> list[CharacterStoryEntry]:
         while True:
             act += 1
             story_id = f"cg_{char.id}_{act:02d}"
-            if load_story_config(story_id) is None:
+            if not story_config_exists(story_id):
                 break
             act_title = f"Act {act}"
             entries.append(
@@ -54,15 +55,7 @@ def get_char_story_entries() -> list[CharacterStoryEntry]:
 
 @cache
 def get_char_story_episodes() -> dict[str, StoryEpisode]:
-    episodes: dict[str, StoryEpisode] = {}
-    for entry in get_char_story_entries():
-        if entry.episode_id in episodes:
-            continue
-        episode = parse_story_config(entry.episode_id)
-        if episode is None:
-            continue
-        episodes[entry.episode_id] = episode
-    return episodes
+    return parse_story_configs(entry.episode_id for entry in get_char_story_entries())
 
 
 def _entries_by_character() -> dict[str, list[CharacterStoryEntry]]:
@@ -74,9 +67,9 @@ def _entries_by_character() -> dict[str, list[CharacterStoryEntry]]:
     return result
 
 
-def build_char_story_pages() -> dict[str, str]:
+def iter_char_story_pages() -> Iterator[tuple[str, str]]:
+    """(page title, text) of each story page, rendered when the consumer asks for it."""
     episodes = get_char_story_episodes()
-    pages: dict[str, str] = {}
     for entries in _entries_by_character().values():
         for i, entry in enumerate(entries):
             prev_page = entries[i - 1].page_title if i > 0 else None
@@ -84,10 +77,7 @@ def build_char_story_pages() -> dict[str, str]:
             top = story_nav_template("CharacterStoryTop", prev_page, next_page)
             bottom = story_nav_template("CharacterStoryBottom", prev_page, next_page)
             content = episode_to_messenger_template(episodes[entry.episode_id])
-            pages[entry.page_title] = (
-                f"{top}\n{with_tyrant_gender_selector(content)}\n{bottom}"
-            )
-    return pages
+            yield entry.page_title, f"{top}\n{with_tyrant_gender_selector(content)}\n{bottom}"
 
 
 def build_char_story_section(
@@ -116,7 +106,7 @@ def build_char_story_sections() -> dict[str, str]:
 
 
 def save_char_stories() -> None:
-    save_story_pages(build_char_story_pages(), "update character story")
+    save_story_pages(iter_char_story_pages(), "update character story")
 
 
 def save_char_story_sections() -> None:
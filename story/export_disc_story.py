@@ -7,14 +7,14 @@ from wikitextparser import parse
 from page_generators.discs import Disc, get_discs
 from story.export_story import episode_to_messenger_template, with_tyrant_gender_selector
 from story.parse_story import (
-    load_story_config,
     normalize_story_id,
-    parse_story_config,
+    parse_story_configs,
+    story_config_exists,
     StoryEpisode,
 )
 from story.story_assets import export_story_assets
 from utils.data_utils import autoload
-from utils.wiki_utils import force_section_text, save_page, s
+from utils.wiki_utils import PublishedPages, force_section_text, published_pages, save_page, s
 
 
 @dataclass
@@ -36,7 +36,7 @@ def get_disc_story_entries() -> list[DiscStoryEntry]:
         if disc is None:
             print(f"WARNING: Disc story has no disc metadata for {disc_id}")
             continue
-        if load_story_config(story_id) is None:
+        if not story_config_exists(story_id):
             print(f"WARNING: Disc story {story_id} has no Lua file")
             continue
         entries.append(
@@ -51,37 +51,42 @@ def get_disc_story_entries() -> list[DiscStoryEntry]:
 
 @cache
 def get_disc_story_episodes() -> dict[str, StoryEpisode]:
-    episodes: dict[str, StoryEpisode] = {}
-    for entry in get_disc_story_entries():
-        if entry.episode_id in episodes:
-            continue
-        episode = parse_story_config(entry.episode_id)
-        if episode is None:
-            continue
-        episodes[entry.episode_id] = episode
-    return episodes
+    return parse_story_configs(entry.episode_id for entry in get_disc_story_entries())
 
 
 def save_disc_stories() -> None:
     episodes = get_disc_story_episodes()
     export_story_assets(episodes)
-    for entry in get_disc_story_entries():
-        episode = episodes.get(entry.episode_id)
-        if episode is None:
-            continue
-        content = with_tyrant_gender_selector(episode_to_messenger_template(episode))
-        page = Page(s, entry.page_title)
-        parsed = parse(page.text)
-        disc_story_next_section = "See also"
-        if not force_section_text(
-            parsed,
-            "Memory Recollection",
-            "{{MemoryRecollectionSection}}\n" + content,
-            prepend=disc_story_next_section,
-        ):
-            print(f"WARNING: Could not find {disc_story_next_section} section on {entry.page_title}")
-            continue
-        save_page(page, str(parsed), "update disc story")
+    published = published_pages()
+    try:
+        for entry in get_disc_story_entries():
+            _save_disc_story(entry, episodes, published)
+    finally:
+        published.save()
+
+
+def _save_disc_story(entry: DiscStoryEntry, episodes: dict[str, StoryEpisode], published: PublishedPages) -> None:
+    episode = episodes.get(entry.episode_id)
+    if episode is None:
+        return
+    content = with_tyrant_gender_selector(episode_to_messenger_template(episode))
+    # The rest of the disc page belongs to other exporters, so only this section is fingerprinted.
+    published_key = f"{entry.page_title}#Memory Recollection"
+    if published.is_current(published_key, content):
+        return
+    page = Page(s, entry.page_title)
+    parsed = parse(page.text)
+    disc_story_next_section = "See also"
+    if not force_section_text(
+        parsed,
+        "Memory Recollection",
+        "{{MemoryRecollectionSection}}\n" + content,
+        prepend=disc_story_next_section,
+    ):
+        print(f"WARNING: Could not find {disc_story_next_section} section on {entry.page_title}")
+        return
+    save_page(page, str(parsed), "update disc story")
+    published.record(published_key, content)
 
 
 def main():
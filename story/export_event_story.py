@@ -1,5 +1,6 @@
 import json
 import re
+from collections.abc import Iterator
 from dataclasses import dataclass
 from functools import cache
 from typing import Any
@@ -17,9 +18,9 @@ from story.export_story import (
     with_tyrant_gender_selector,
 )
 from story.parse_story import (
-    load_story_config,
     normalize_story_id,
-    parse_story_config,
+    parse_story_configs,
+    story_config_exists,
     StoryEpisode,
 )
 from story.story_assets import export_story_assets
@@ -88,7 +89,7 @@ def get_event_story_entries() -> list[EventStoryEntry]:
             if not story_id:
                 print(f"WARNING: Event story row {row['Id']} has no Lua story name")
                 continue
-            if load_story_config(story_id) is None:
+            if not story_config_exists(story_id):
                 print(f"WARNING: Event story {story_id} has no Lua file")
                 continue
 
@@ -119,20 +120,12 @@ def get_event_story_entries() -> list[EventStoryEntry]:
 
 @cache
 def get_event_story_episodes() -> dict[str, StoryEpisode]:
-    episodes: dict[str, StoryEpisode] = {}
-    for entry in get_event_story_entries():
-        if entry.episode_id in episodes:
-            continue
-        episode = parse_story_config(entry.episode_id)
-        if episode is None:
-            continue
-        episodes[entry.episode_id] = episode
-    return episodes
+    return parse_story_configs(entry.episode_id for entry in get_event_story_entries())
 
 
-def build_event_story_pages() -> dict[str, str]:
+def iter_event_story_pages() -> Iterator[tuple[str, str]]:
+    """(page title, text) of each story page, rendered when the consumer asks for it."""
     episodes = get_event_story_episodes()
-    pages: dict[str, str] = {}
     event_entries: dict[str, list[EventStoryEntry]] = {}
     for entry in get_event_story_entries():
         if entry.episode_id in episodes:
@@ -149,10 +142,7 @@ def build_event_story_pages() -> dict[str, str]:
                 episodes[entry.episode_id],
                 choice_target_links.get(entry.episode_id),
             )
-            pages[entry.page_title] = (
-                f"{top}\n{with_tyrant_gender_selector(content)}\n{bottom}"
-            )
-    return pages
+            yield entry.page_title, f"{top}\n{with_tyrant_gender_selector(content)}\n{bottom}"
 
 
 def build_event_story_section(
@@ -186,7 +176,7 @@ def build_event_story_sections() -> dict[str, str]:
 
 
 def save_event_stories() -> None:
-    save_story_pages(build_event_story_pages(), "update event story")
+    save_story_pages(iter_event_story_pages(), "update event story")
 
 
 def save_event_story_sections() -> None:
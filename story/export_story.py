@@ -1,15 +1,14 @@
 import re
-from collections.abc import Sequence
+from collections.abc import Iterable, Iterator, Sequence
 from dataclasses import dataclass
 from functools import cache
 from typing import Optional
 
 from character_info.char_sprite_face import sanitize_css_class
-from character_info.characters import id_to_char
-from story.parse_story import get_story_episodes, StoryEpisode, StoryRow
+from story.parse_story import get_speaker, get_story_episodes, StoryEpisode, StoryRow
 from story.story_assets import export_story_assets, get_front_object_file_name
 from utils.data_utils import assets_root
-from utils.wiki_utils import save_page
+from utils.wiki_utils import published_pages, save_page
 
 
 @cache
@@ -43,8 +42,6 @@ class ChoiceContext:
 
 PROTAGONIST_CHARACTER_IDS = frozenset({"avg3_100"})
 TYRANT_GENDER_GROUP = "tgender"
-FEMALE_TYRANT_NAME = "Female tyrant"
-MALE_TYRANT_NAME = "Male tyrant"
 
 
 def get_character_sprite_path(
@@ -64,21 +61,6 @@ def with_tyrant_gender_selector(content: str) -> str:
     return "{{GenderToggle}}\n" + content
 
 
-def _tyrant_sprite_name(char_name: str) -> str:
-    if char_name in {FEMALE_TYRANT_NAME, MALE_TYRANT_NAME}:
-        return FEMALE_TYRANT_NAME
-    return char_name
-
-
-def _sprite_name_for_character_id(character_id: str, fallback_name: str) -> str:
-    match = re.fullmatch(r"avg1_(\d+)", character_id)
-    if match:
-        character = id_to_char(match.group(1))
-        if character is not None:
-            return character.name
-    return fallback_name
-
-
 def _gendered_background_pair(bg_image: str) -> tuple[str, str] | None:
     replacements = [
         ("female_tyrant", "male_tyrant"),
@@ -155,8 +137,7 @@ def story_row_to_messenger(
         )
 
         speaker_name = speaker
-        sprite_name = _sprite_name_for_character_id(character_id, speaker_name)
-        sprite_name = _tyrant_sprite_name(sprite_name)
+        sprite_name = get_speaker(character_id).sprite_name
 
         # Skip image if expression is "00"
         image_path = None
@@ -258,52 +239,51 @@ def _current_group_option(
     return None, None
 
 
-def _append_choice_target_link(
-    result: list[str],
+def _choice_target_link(
     context: ChoiceContext,
     choice_target_links: dict[tuple[str, str], str],
-) -> None:
+) -> list[str]:
     if context.choice_id is None or context.group is None or context.option is None:
-        return
+        return []
     target_page = choice_target_links.get((context.choice_id, context.option))
     if target_page is None:
-        return
+        return []
     target_label = target_page.rsplit("/", 1)[-1]
-    result.extend(
-        [
-            "| info",
-            f"| text :: Continue to [[{target_page}|{target_label}]]",
-            f"| group :: {context.group}",
-            f"| option :: {context.option}",
-            "",
-        ]
-    )
+    return [
+        "| info",
+        f"| text :: Continue to [[{target_page}|{target_label}]]",
+        f"| group :: {context.group}",
+        f"| option :: {context.option}",
+        "",
+    ]
 
 
-def episode_to_messenger_template(
+def iter_messenger_template(
     episode: StoryEpisode,
     choice_target_links: dict[tuple[str, str], str] | None = None,
-) -> str:
+) -> Iterator[str]:
+    """Lines of the episode's Messenger template, rendered one row at a time."""
     if choice_target_links is None:
         choice_target_links = {}
 
-    result = [
+    yield from (
         "{{Messenger",
         "",
         "| config",
         "| image-default-width :: 300px",
         "| columns :: 3",
         "",
-    ]
+    )
 
     if episode.title or episode.subtitle:
-        episode_info = f"{episode.title}"
         if episode.subtitle:
-            episode_info += f" - {episode.subtitle}"
-        result.extend(["| info", f"| text :: {episode_info}", ""])
+            episode_info = f"{episode.title} - {episode.subtitle}"
+        else:
+            episode_info = episode.title
+        yield from ("| info", f"| text :: {episode_info}", "")
 
     if episode.description:
-        result.extend(["| info", f"| text :: {episode.description}", ""])
+        yield from ("| info", f"| text :: {episode.description}", "")
 
     current_speaker = None
     choice_group_counter = 0
@@ -314,12 +294,10 @@ def episode_to_messenger_template(
             options = _get_choice_options(row)
             if len(options) == 1:
                 group, option = _current_group_option(choice_stack)
-                result.extend(
-                    _append_group_option(
-                        ["| reply", f"| text :: {options[0]}", ""],
-                        group,
-                        option,
-                    )
+                yield from _append_group_option(
+                    ["| reply", f"| text :: {options[0]}", ""],
+                    group,
+                    option,
                 )
                 choice_stack.append(ChoiceContext())
             else:
@@ -334,7 +312,7 @@ def episode_to_messenger_template(
                 for i, opt_text in enumerate(options, 1):
                     options_block.append(f"| option{i} :: {opt_text}")
                 options_block.append("")
-                result.extend(options_block)
+                yield from options_block
             continue
 
         if row.name == "choice_jump":
@@ -344,8 +322,7 @@ def episode_to_messenger_template(
 
         if row.name == "choice_rollover":
             if choice_stack and choice_stack[-1].group is not None:
-                _append_choice_target_link(
-                    result,
+                yield from _choice_target_link(
                     choice_stack[-1],
                     choice_target_links,
                 )
@@ -354,8 +331,7 @@ def episode_to_messenger_template(
 
         if row.name == "choice_end":
             if choice_stack:
-                _append_choice_target_link(
-                    result,
+                yield from _choice_target_link(
                     choice_stack[-1],
                     choice_target_links,
                 )
@@ -363,19 +339,24 @@ def episode_to_messenger_template(
             continue
 
         group, option = _current_group_option(choice_stack)
-        messenger_rows = story_row_to_messenger(
+        yield from story_row_to_messenger(
             row,
             current_speaker,
             group,
             option,
         )
-        result.extend(messenger_rows)
 
         if row.name == "dialogue":
             current_speaker = row.attributes.get("speaker", "")
 
-    result.append("}}")
-    return "\n".join(result)
+    yield "}}"
+
+
+def episode_to_messenger_template(
+    episode: StoryEpisode,
+    choice_target_links: dict[tuple[str, str], str] | None = None,
+) -> str:
+    return "\n".join(iter_messenger_template(episode, choice_target_links))
 
 
 def major_choice_target_links(
@@ -455,67 +436,91 @@ def create_branch_tabs(branch_groups: dict[str, str]) -> str:
     return with_tyrant_gender_selector("\n".join(tab_result))
 
 
-def process_story_branches(episodes: dict[str, StoryEpisode]) -> dict[str, StoryExport]:
-    exports = {}
-    processed_episodes = set()
-
-    for episode_id, episode in episodes.items():
+def _branch_ids(episodes: dict[str, StoryEpisode]) -> dict[str, list[str]]:
+    """Episode ids of each set of branches (`<base>_a`, `<base>_b`, ...), by base id."""
+    branch_ids: dict[str, list[str]] = {}
+    for episode_id in episodes:
         branch_match = re.match(r"(.+)_[a-z]$", episode_id)
         if branch_match:
-            base_id = branch_match.group(1)
-            if base_id not in exports:
-                exports[base_id] = StoryExport(
-                    episode_id=base_id,
-                    title=episode.title,
-                    subtitle=episode.subtitle,
-                    description=episode.description,
-                    branches={},
-                    main_content="",
-                )
+            branch_ids.setdefault(branch_match.group(1), []).append(episode_id)
+    return branch_ids
+
+
+def _branched_export(base_id: str, episode_ids: list[str], episodes: dict[str, StoryEpisode]) -> StoryExport:
+    first = episodes[episode_ids[0]]
+    return StoryExport(
+        episode_id=base_id,
+        title=first.title,
+        subtitle=first.subtitle,
+        description=first.description,
+        branches={
+            episode_id: episode_to_messenger_template(episodes[episode_id])
+            for episode_id in episode_ids
+        },
+        main_content="",
+    )
 
-            branch_content = episode_to_messenger_template(episode)
-            exports[base_id].branches[episode_id] = branch_content
-            processed_episodes.add(episode_id)
 
-    for episode_id, episode in episodes.items():
-        if episode_id not in processed_episodes:
-            content = with_tyrant_gender_selector(episode_to_messenger_template(episode))
-            exports[episode_id] = StoryExport(
-                episode_id=episode_id,
-                title=episode.title,
-                subtitle=episode.subtitle,
-                description=episode.description,
-                branches={},
-                main_content=content,
-            )
+def _single_export(episode_id: str, episode: StoryEpisode) -> StoryExport:
+    return StoryExport(
+        episode_id=episode_id,
+        title=episode.title,
+        subtitle=episode.subtitle,
+        description=episode.description,
+        branches={},
+        main_content=with_tyrant_gender_selector(episode_to_messenger_template(episode)),
+    )
+
 
-    return exports
+def iter_story_exports(episodes: dict[str, StoryEpisode]) -> Iterator[StoryExport]:
+    """Render one export at a time: each set of branches together, then every unbranched episode."""
+    branch_ids = _branch_ids(episodes)
+    for base_id, episode_ids in branch_ids.items():
+        yield _branched_export(base_id, episode_ids, episodes)
+
+    branched = {episode_id for episode_ids in branch_ids.values() for episode_id in episode_ids}
+    for episode_id, episode in episodes.items():
+        if episode_id not in branched:
+            yield _single_export(episode_id, episode)
 
 
 def save_story_pages(
-    pages: dict[str, str],
+    pages: Iterable[tuple[str, str]],
     summary: str = "update story",
 ) -> None:
-    for page_title, text in pages.items():
-        save_page(page_title, text, summary)
+    """Save (title, text) pairs as they are rendered.
+
+    Pages whose text matches what was last published from here are skipped without
+    a wiki request; the rest still go through save_page's comparison.
+    """
+    published = published_pages()
+    try:
+        for page_title, text in pages:
+            if published.is_current(page_title, text):
+                continue
+            save_page(page_title, text, summary)
+            published.record(page_title, text)
+    finally:
+        published.save()
 
 
 def main():
     episodes = get_story_episodes()
     export_story_assets(episodes)
-    exports = process_story_branches(episodes)
-
-    # Get the first story export
-    first_export_id = min(exports.keys()) if exports else None
-    if first_export_id:
-        export_data = exports[first_export_id]
 
-        if export_data.branches:
-            # If it has branches, output the tabbed content
-            print(create_branch_tabs(export_data.branches))
-        else:
-            # If it's a single story, output the messenger template
-            print(export_data.main_content)
+    # Pick the first story export by id, then render only that one
+    branch_ids = _branch_ids(episodes)
+    branched = {episode_id for episode_ids in branch_ids.values() for episode_id in episode_ids}
+    first_id = min([*branch_ids, *(episode_id for episode_id in episodes if episode_id not in branched)],
+                   default=None)
+    if first_id is None:
+        return
+    if first_id in branch_ids:
+        # If it has branches, output the tabbed content
+        print(create_branch_tabs(_branched_export(first_id, branch_ids[first_id], episodes).branches))
+    else:
+        # If it's a single story, output the messenger template
+        print(_single_export(first_id, episodes[first_id]).main_content)
 
 
 if __name__ == "__main__":
@@ -1,14 +1,34 @@
+import os
+import pickle
 import re
-from dataclasses import dataclass
-from functools import cache
-from typing import Any, Optional
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import cache, lru_cache
+from pathlib import Path
+from typing import Any, Callable, ClassVar, Iterable, Optional
+
+import xxhash
 
 from character_info.char_sprites import get_avg_characters
-from utils.data_utils import load_lua_table
+from character_info.characters import id_to_char
+from utils.data_utils import load_lua_table, lua_path
 from utils.text_utils import escape_text
 
+# Bump whenever a parser change alters the episodes it produces, to drop cached parses.
+PARSER_VERSION = 2
+STORY_CACHE_DIR = Path("assets") / "story_cache"
+# Lua tables besides the episode's own that parsing reads: speaker names and gendered text.
+STORY_CONTEXT_TABLES = (
+    "game/ui/avg/_en/preset/avgcharacter.lua",
+    "game/ui/avg/_en/preset/avguitext.lua",
+)
+# Episodes handed to a pool worker at a time; below two tasks' worth everything is parsed in-process.
+EPISODES_PER_TASK = 8
+
 
 class StoryRow:
+    __slots__ = ("name", "attributes")
+
     name: str
     attributes: dict[str, str]
 
@@ -26,7 +46,7 @@ class StoryEpisode:
     rows: list[StoryRow]
 
 
-@dataclass
+@dataclass(slots=True)
 class CharacterState:
     variant: str = "a"
     expression: str = "00"
@@ -38,24 +58,18 @@ class CharacterState:
             self.expression = expression
 
 
-@dataclass
+@dataclass(slots=True)
 class StoryState:
-    character_states: Optional[dict[str, CharacterState]] = None
+    character_states: dict[str, CharacterState] = field(default_factory=dict)
     pending_reply_char: Optional[str] = None
     current_background: Optional[str] = None
-    current_front_objects: Optional[dict[str, str]] = None
-
-    def __post_init__(self):
-        if self.character_states is None:
-            self.character_states = {}
-        if self.current_front_objects is None:
-            self.current_front_objects = {}
+    current_front_objects: dict[str, str] = field(default_factory=dict)
 
     def get_character_state(self, char_id: str) -> CharacterState:
-        assert self.character_states is not None
-        if char_id not in self.character_states:
-            self.character_states[char_id] = CharacterState()
-        return self.character_states[char_id]
+        char_state = self.character_states.get(char_id)
+        if char_state is None:
+            char_state = self.character_states[char_id] = CharacterState()
+        return char_state
 
 
 @cache
@@ -66,20 +80,55 @@ def get_character_sex_strings() -> dict[str, list[str]]:
     return {}
 
 
-@cache
-def get_character_name_from_id(char_id: str | int) -> str:
-    """Get character name from character ID, handling both playable characters and NPCs."""
-    # Ensure char_id is a string
-    if isinstance(char_id, int):
-        char_id = str(char_id)
+FEMALE_TYRANT_NAME = "Female tyrant"
+MALE_TYRANT_NAME = "Male tyrant"
 
+
+@dataclass(frozen=True, slots=True)
+class Speaker:
+    """How a story character id is shown."""
+    name: str
+    # Name the character's sprites are filed under; both tyrants share the female ones.
+    sprite_name: str
+
+
+def _resolve_speaker(char_id: str, name: str) -> Speaker:
+    sprite_name = name
+    match = re.fullmatch(r"avg1_(\d+)", char_id)
+    if match:
+        character = id_to_char(match.group(1))
+        if character is not None:
+            sprite_name = character.name
+    if sprite_name in {FEMALE_TYRANT_NAME, MALE_TYRANT_NAME}:
+        sprite_name = FEMALE_TYRANT_NAME
+    return Speaker(name, sprite_name)
+
+
+@cache
+def get_speakers() -> dict[str, Speaker]:
+    """Every id in avgcharacter.lua, resolved once. Shared; do not modify."""
     avg_chars, _ = get_avg_characters()
+    return {
+        char_id: _resolve_speaker(char_id, avg_char.name)
+        for char_id, avg_char in avg_chars.items()
+    }
+
 
-    if char_id in avg_chars:
-        return avg_chars[char_id].name
+@cache
+def _unknown_speaker(char_id: str) -> Speaker:
+    # Ids missing from avgcharacter.lua are shown as themselves.
+    return _resolve_speaker(char_id, char_id)
+
+
+def get_speaker(char_id: str | int) -> Speaker:
+    char_id = str(char_id)
+    speaker = get_speakers().get(char_id)
+    return speaker if speaker is not None else _unknown_speaker(char_id)
 
-    # Fallback to the raw ID if no mapping found
-    return char_id
+
+def get_character_name_from_id(char_id: str | int) -> str:
+    """Get character name from character ID, handling both playable characters and NPCs."""
+    return get_speaker(char_id).name
 
 
 def phone_sticker_link(image_name: str) -> str:
@@ -87,23 +136,40 @@ def phone_sticker_link(image_name: str) -> str:
     return f"[[File:Phone_{image_name}.png|{size}px]]"
 
 
+_SEX_MARKER = re.compile(r"==SEX\d*==")
+_GENDER_TAB_TOKEN = re.compile(r"__STORY_GENDER_TAB_(\d+)__")
+
+
+@cache
+def get_gender_tabs() -> dict[str, tuple[str, str]]:
+    """Each ==SEX== marker with the placeholder token that stands in for it during escaping and
+    the GenderContent template that replaces the token afterwards."""
+    tabs = {}
+    for i, (marker, values) in enumerate(get_character_sex_strings().items()):
+        female, male = (escape_text(value) for value in values)
+        tabs[marker] = (f"__STORY_GENDER_TAB_{i}__", f"{{{{GenderContent|1={female}|2={male}}}}}")
+    return tabs
+
+
+@lru_cache(maxsize=1 << 16)
 def process_text(text: str) -> str:
-    sex_dict = get_character_sex_strings()
-    gender_tabs: dict[str, str] = {}
+    if "==SEX" not in text:
+        return escape_text(text)
+    gender_tabs = get_gender_tabs()
+    templates: dict[str, str] = {}
 
     def replace_sex_marker(match: re.Match[str]) -> str:
-        values = sex_dict.get(match.group(0))
-        if values is None:
+        tab = gender_tabs.get(match.group(0))
+        if tab is None:
             return match.group(0)
-        female, male = (escape_text(value) for value in values)
-        token = f"__STORY_GENDER_TAB_{len(gender_tabs)}__"
-        gender_tabs[token] = f"{{{{GenderContent|1={female}|2={male}}}}}"
+        token, template = tab
+        templates[token] = template
         return token
 
-    text, _ = re.subn(r"==SEX\d*==", replace_sex_marker, text)
+    text = _SEX_MARKER.sub(replace_sex_marker, text)
     text = escape_text(text)
-    for token, tab in gender_tabs.items():
-        text = text.replace(token, tab)
+    if templates:
+        text = _GENDER_TAB_TOKEN.sub(lambda m: templates.get(m.group(0), m.group(0)), text)
     return text
 
 
@@ -111,8 +177,17 @@ def normalize_story_id(story_id: str) -> str:
     return story_id.removesuffix(".lua").lower()
 
 
+def _story_config_name(story_id: str) -> str:
+    return f"game/ui/avg/_en/config/{normalize_story_id(story_id)}.lua"
+
+
 def load_story_config(story_id: str) -> list[dict[str, Any]] | None:
-    return load_lua_table(f"game/ui/avg/_en/config/{normalize_story_id(story_id)}.lua")
+    return load_lua_table(_story_config_name(story_id))
+
+
+def story_config_exists(story_id: str) -> bool:
+    """Whether the story has a Lua config, without decoding it."""
+    return lua_path(_story_config_name(story_id)) is not None
 
 
 def parse_story_config(story_id: str) -> StoryEpisode | None:
@@ -122,326 +197,404 @@ def parse_story_config(story_id: str) -> StoryEpisode | None:
     return parse_story_episode(normalize_story_id(story_id), data)
 
 
-def parse_story_episode(episode_id: str, data: Any) -> StoryEpisode:
-    rows = []
-    state = StoryState()
+StoryHandler = Callable[["StoryInterpreter"], None]
 
-    # Extract episode info from SetIntro
-    title = ""
-    subtitle = ""
-    description = ""
 
-    for row in data:
-        cmd = row["cmd"]
-        params = row.get("param", [])
+def handles(*commands: str) -> Callable[[StoryHandler], StoryHandler]:
+    """Register a `StoryInterpreter` method as the handler of the given story commands."""
+    def decorate(handler: StoryHandler) -> StoryHandler:
+        handler.story_commands = commands
+        return handler
+    return decorate
 
-        if cmd == "SetIntro" and len(params) >= 5:
-            title = process_text(params[1])
-            subtitle = process_text(params[2])
-            description = process_text(params[3])
-            break
 
-    for row in data:
-        cmd = row["cmd"]
-        params = row.get("param", [])
+class _HandlerRegistry:
+    """Gives every subclass, `StoryInterpreter` included, its own copy of the inherited
+    handlers with its `handles` methods added."""
 
-        def append_dialogue(char_id: str, text: str):
-            speaker_name = get_character_name_from_id(char_id)
-
-            char_state = state.get_character_state(char_id)
-
-            is_reply = char_id == state.pending_reply_char
-            if is_reply:
-                state.pending_reply_char = None
-
-            rows.append(
-                StoryRow(
-                    "dialogue",
-                    {
-                        "speaker": speaker_name,
-                        "text": text,
-                        "character_id": char_id,
-                        "variant": char_state.variant,
-                        "expression": char_state.expression,
-                        "is_reply": "true" if is_reply else "",
-                    },
-                )
-            )
+    handlers: ClassVar[dict[str, StoryHandler]] = {}
+
+    __slots__ = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        handlers = dict(cls.handlers)
+        for attr in vars(cls).values():
+            for command in getattr(attr, "story_commands", ()):
+                handlers[command] = attr
+        cls.handlers = handlers
+
+
+class StoryInterpreter(_HandlerRegistry):
+    """Turns the command rows of one episode into `StoryRow`s.
 
-        def set_talk():
-            _, char_id, _, _, _, _, _, text, _ = params
-            # Animation frames the game itself keeps out of the story log.
-            if text.startswith("_NOT_IN_LOG_"):
-                return
-            text = process_text(text)
+    Handlers are looked up in a class-level registry, filled from the methods marked
+    with `handles`. Subclasses inherit and can override entries the same way, and
+    `register` adds a plain function as a handler; commands without one are skipped.
+    """
+
+    __slots__ = ("rows", "state", "params")
+
+    def __init__(self):
+        self.rows: list[StoryRow] = []
+        self.state = StoryState()
+        self.params: list[Any] = []
+
+    @classmethod
+    def register(cls, command: str, handler: StoryHandler) -> None:
+        cls.handlers[command] = handler
+
+    def run(self, data: Any) -> list[StoryRow]:
+        handlers = self.handlers
+        for row in data:
+            handler = handlers.get(row["cmd"])
+            if handler is not None:
+                self.params = row.get("param", [])
+                handler(self)
+        return self.rows
+
+    def append_dialogue(self, char_id: str, text: str):
+        state = self.state
+        char_state = state.get_character_state(char_id)
+
+        is_reply = char_id == state.pending_reply_char
+        if is_reply:
+            state.pending_reply_char = None
+
+        self.rows.append(
+            StoryRow(
+                "dialogue",
+                {
+                    "speaker": get_character_name_from_id(char_id),
+                    "text": text,
+                    "character_id": char_id,
+                    "variant": char_state.variant,
+                    "expression": char_state.expression,
+                    "is_reply": "true" if is_reply else "",
+                },
+            )
+        )
+
+    def update_character_state(
+        self,
+        char_id: str,
+        char_part: Optional[str],
+        char_expression: Optional[str],
+    ):
+        self.state.get_character_state(char_id).update(variant=char_part, expression=char_expression)
+
+    def append_choice_begin(
+        self,
+        choice_id: str,
+        choice_texts: list[Any],
+        choice_type: str = "",
+    ):
+        attrs: dict[str, str] = {"choice_id": choice_id}
+        if choice_type:
+            attrs["choice_type"] = choice_type
+        option_num = 0
+        for text in choice_texts:
             if text:
-                append_dialogue(char_id, text)
-
-        def set_phone_msg():
-            msg_type, char_id, image_name, _, _, _, _, text, _ = params
-            text = process_text(text)
-            if msg_type == 5:
-                if text:
-                    rows.append(StoryRow("info", {"text": text}))
-                return
-            if msg_type in (3, 4) and image_name:
-                text = phone_sticker_link(image_name)
+                option_num += 1
+                attrs[f"option{option_num}"] = process_text(str(text))
+        self.rows.append(StoryRow("choice_begin", attrs))
+
+    @handles("SetTalk")
+    def set_talk(self):
+        _, char_id, _, _, _, _, _, text, _ = self.params
+        # Animation frames the game itself keeps out of the story log.
+        if text.startswith("_NOT_IN_LOG_"):
+            return
+        text = process_text(text)
+        if text:
+            self.append_dialogue(char_id, text)
+
+    @handles("SetPhoneMsg")
+    def set_phone_msg(self):
+        msg_type, char_id, image_name, _, _, _, _, text, _ = self.params
+        text = process_text(text)
+        if msg_type == 5:
             if text:
-                append_dialogue(char_id, text)
-
-        def set_bgm():
-            track_type = params[0]
-            bgm_file = params[3]
-
-            rows.append(
-                StoryRow(
-                    "bgm",
-                    {
-                        "action": "play"
-                        if track_type == 0
-                        else "stop",  # 0 = play, 1 = stop
-                        "file": bgm_file
-                    },
-                )
+                self.rows.append(StoryRow("info", {"text": text}))
+            return
+        if msg_type in (3, 4) and image_name:
+            text = phone_sticker_link(image_name)
+        if text:
+            self.append_dialogue(char_id, text)
+
+    @handles("SetBGM")
+    def set_bgm(self):
+        params = self.params
+        self.rows.append(
+            StoryRow(
+                "bgm",
+                {
+                    "action": "play" if params[0] == 0 else "stop",  # 0 = play, 1 = stop
+                    "file": params[3],
+                },
             )
-
-        def set_bg():
-            bg_image = str(params[1]).lower()
-            if bg_image == state.current_background:
-                return
-            state.current_background = bg_image
-
-            rows.append(
-                StoryRow(
-                    "background",
-                    {
-                        "image": bg_image,
-                    },
-                )
+        )
+
+    @handles("SetBg")
+    def set_bg(self):
+        bg_image = str(self.params[1]).lower()
+        if bg_image == self.state.current_background:
+            return
+        self.state.current_background = bg_image
+        self.rows.append(StoryRow("background", {"image": bg_image}))
+
+    @handles("SetSceneHeading")
+    def set_scene_heading(self):
+        time, month, day, location, area = self.params[:5]
+        self.rows.append(
+            StoryRow(
+                "scene_heading",
+                {
+                    "time": time,
+                    "month": month,
+                    "day": day,
+                    "location": location,
+                    "area": area,
+                },
             )
-
-        def set_scene_heading():
-            time = params[0]
-            month = params[1]
-            day = params[2]
-            location = params[3]
-            area = params[4]
-
-            rows.append(
-                StoryRow(
-                    "scene_heading",
-                    {
-                        "time": time,
-                        "month": month,
-                        "day": day,
-                        "location": location,
-                        "area": area,
-                    },
-                )
+        )
+
+    @handles("SetAudio")
+    def set_audio(self):
+        audio_file = self.params[1]
+        rows = self.rows
+        if rows and rows[-1].name == "sound_effect":
+            rows[-1].attributes["files"] += f",{audio_file}"
+        else:
+            rows.append(StoryRow("sound_effect", {"files": audio_file}))
+
+    @handles("SetFrontObj")
+    def set_front_obj(self) -> None:
+        front_objects = self.state.current_front_objects
+        action = self.params[0]
+        position = str(self.params[1])
+        image_name = self.params[2]
+
+        if action == 1:
+            front_objects.pop(position, None)
+            return
+
+        if action != 0:
+            return
+
+        if not image_name:
+            return
+
+        if image_name in front_objects.values():
+            front_objects[position] = image_name
+            return
+
+        front_objects[position] = image_name
+        self.rows.append(
+            StoryRow(
+                "front_object",
+                {
+                    "image": image_name.lower(),
+                    "position": position,
+                },
             )
-
-        def set_audio():
-            audio_file = params[1]
-            if rows and rows[-1].name == "sound_effect":
-                rows[-1].attributes["files"] += f",{audio_file}"
+        )
+
+    @handles("SetChar")
+    def set_char(self):
+        self.update_character_state(self.params[3], self.params[4], self.params[5])
+
+    @handles("SetCharHead")
+    def set_char_head(self):
+        self.update_character_state(self.params[5], self.params[6], self.params[7])
+
+    @handles("CtrlChar")
+    def ctrl_char(self):
+        self.update_character_state(self.params[0], self.params[1], self.params[2])
+
+    @handles("SetMainRoleTalk")
+    def set_main_role_talk(self):
+        # [position, _, expression, emoji, _, part, _, _, char_id]
+        params = self.params
+        self.update_character_state(params[8], params[5], params[2])
+        self.state.pending_reply_char = params[8]
+
+    @handles("SetChoiceBegin")
+    def set_choice_begin(self):
+        self.append_choice_begin(str(self.params[0]), self.params[12])
+
+    @handles("SetPersonalityChoice")
+    def set_personality_choice(self):
+        self.append_choice_begin(str(self.params[0]), self.params[2:5])
+
+    @handles("IfUnlock")
+    def set_ifunlock_choice(self):
+        # params[0] = a_1
+        # params[1] = C07_06_bb (reference to episode that needs to be unlocked?)
+        params = self.params
+        self.append_choice_begin(str(params[0]), [
+            f"{str(params[1])} unlocked",  # How to get pretty name?
+            "Path not discovered yet"
+        ])
+        self.rows.append(StoryRow("choice_jump", {
+            "choice_id": str(params[0]),
+            "option": "1",
+        }))
+
+    @handles("IfUnlockElse")
+    def set_ifunlock_else(self):
+        self.rows.append(StoryRow("choice_jump", {
+            "choice_id": str(self.params[0]),
+            "option": "2",
+        }))
+
+    @handles("SetPhoneMsgChoiceBegin")
+    def set_phone_msg_choice_begin(self):
+        self.append_choice_begin(str(self.params[0]), self.params[1:7])
+
+    @handles("SetMajorChoice")
+    def set_major_choice(self):
+        choice_texts = []
+        option_params = self.params[1:-5]
+        for i in range(0, len(option_params), 7):
+            option = option_params[i:i + 7]
+            if len(option) < 4:
+                continue
+            prompt = str(option[2]).strip()
+            action = str(option[3]).strip()
+            if prompt and action:
+                choice_texts.append(f"{prompt}<br>{action}")
             else:
-                rows.append(StoryRow("sound_effect", {"files": audio_file}))
-
-        def set_front_obj() -> None:
-            assert state.current_front_objects is not None
-            action = params[0]
-            position = str(params[1])
-            image_name = params[2]
-
-            if action == 1:
-                state.current_front_objects.pop(position, None)
-                return
-
-            if action != 0:
-                return
-
-            if not image_name:
-                return
-
-            if image_name in state.current_front_objects.values():
-                state.current_front_objects[position] = image_name
-                return
-
-            state.current_front_objects[position] = image_name
-            rows.append(
-                StoryRow(
-                    "front_object",
-                    {
-                        "image": image_name.lower(),
-                        "position": position,
-                    },
-                )
-            )
+                choice_texts.append(prompt or action)
+        self.append_choice_begin(str(self.params[0]), choice_texts, "major")
+
+    @handles("SetChoiceJumpTo", "SetPersonalityChoiceJumpTo", "SetMajorChoiceJumpTo", "SetPhoneMsgChoiceJumpTo")
+    def set_choice_jump(self):
+        self.rows.append(StoryRow("choice_jump", {
+            "choice_id": str(self.params[0]),
+            "option": str(self.params[1]),
+        }))
+
+    @handles("SetChoiceRollover", "SetPersonalityChoiceRollover", "SetMajorChoiceRollover",
+             "SetPhoneMsgChoiceRollover")
+    def set_choice_rollover(self):
+        self.rows.append(StoryRow("choice_rollover", {
+            "choice_id": str(self.params[0]),
+        }))
+
+    @handles("SetChoiceEnd", "SetPersonalityChoiceEnd", "SetMajorChoiceEnd", "SetPhoneMsgChoiceEnd",
+             "IfUnlockEnd")
+    def set_choice_end(self):
+        self.rows.append(StoryRow("choice_end", {
+            "choice_id": str(self.params[0]),
+        }))
+
+
+def parse_story_intro(data: Any) -> tuple[str, str, str]:
+    """Title, subtitle and description from the episode's SetIntro row."""
+    for row in data:
+        params = row.get("param", [])
+        if row["cmd"] == "SetIntro" and len(params) >= 5:
+            return process_text(params[1]), process_text(params[2]), process_text(params[3])
+    return "", "", ""
 
-        def update_character_state(
-            char_id: str,
-            char_part: Optional[str],
-            char_expression: Optional[str],
-        ):
-            char_state = state.get_character_state(char_id)
-            char_state.update(variant=char_part, expression=char_expression)
-
-        def set_char():
-            update_character_state(params[3], params[4], params[5])
-
-        def set_char_head():
-            update_character_state(params[5], params[6], params[7])
-
-        def ctrl_char():
-            update_character_state(params[0], params[1], params[2])
-
-        def set_main_role_talk():
-            # [position, _, expression, emoji, _, part, _, _, char_id]
-            update_character_state(params[8], params[5], params[2])
-            state.pending_reply_char = params[8]
-
-        def append_choice_begin(
-            choice_id: str,
-            choice_texts: list[Any],
-            choice_type: str = "",
-        ):
-            attrs: dict[str, str] = {"choice_id": choice_id}
-            if choice_type:
-                attrs["choice_type"] = choice_type
-            option_num = 0
-            for text in choice_texts:
-                if text:
-                    option_num += 1
-                    attrs[f"option{option_num}"] = process_text(str(text))
-            rows.append(StoryRow("choice_begin", attrs))
-
-        def set_choice_begin():
-            append_choice_begin(str(params[0]), params[12])
-
-        def set_personality_choice():
-            append_choice_begin(str(params[0]), params[2:5])
-
-        def set_ifunlock_choice():
-            # params[0] = a_1
-            # params[1] = C07_06_bb (reference to episode that needs to be unlocked?)
-            append_choice_begin(str(params[0]), [
-                f"{str(params[1])} unlocked", # How to get pretty name?
-                "Path not discovered yet"
-            ])
-            rows.append(StoryRow("choice_jump", {
-                "choice_id": str(params[0]),
-                "option": "1",
-            }))
-
-        def set_ifunlock_else():
-            rows.append(StoryRow("choice_jump", {
-                "choice_id": str(params[0]),
-                "option": "2",
-            }))
-
-        def set_ifunlock_end():
-            set_choice_end()
-
-        def set_phone_msg_choice_begin():
-            append_choice_begin(str(params[0]), params[1:7])
-
-        def set_major_choice():
-            choice_texts = []
-            option_params = params[1:-5]
-            for i in range(0, len(option_params), 7):
-                option = option_params[i:i + 7]
-                if len(option) < 4:
-                    continue
-                prompt = str(option[2]).strip()
-                action = str(option[3]).strip()
-                if prompt and action:
-                    choice_texts.append(f"{prompt}<br>{action}")
-                else:
-                    choice_texts.append(prompt or action)
-            append_choice_begin(str(params[0]), choice_texts, "major")
-
-        def set_choice_jump():
-            rows.append(StoryRow("choice_jump", {
-                "choice_id": str(params[0]),
-                "option": str(params[1]),
-            }))
-
-        def set_choice_rollover():
-            rows.append(StoryRow("choice_rollover", {
-                "choice_id": str(params[0]),
-            }))
-
-        def set_choice_end():
-            rows.append(StoryRow("choice_end", {
-                "choice_id": str(params[0]),
-            }))
-
-        # Dispatcher for different command types
-        dispatcher = {
-            "SetTalk": set_talk,
-            "SetPhoneMsg": set_phone_msg,
-            "SetBGM": set_bgm,
-            "SetBg": set_bg,
-            "SetSceneHeading": set_scene_heading,
-            "SetAudio": set_audio,
-            "SetFrontObj": set_front_obj,
-            "SetChar": set_char,
-            "SetCharHead": set_char_head,
-            "CtrlChar": ctrl_char,
-            "SetMainRoleTalk": set_main_role_talk,
-            "SetChoiceBegin": set_choice_begin,
-            "SetChoiceJumpTo": set_choice_jump,
-            "SetChoiceRollover": set_choice_rollover,
-            "SetChoiceEnd": set_choice_end,
-            "IfUnlock": set_ifunlock_choice,
-            "IfUnlockElse": set_ifunlock_else,
-            "IfUnlockEnd": set_ifunlock_end,
-            "SetPersonalityChoice": set_personality_choice,
-            "SetPersonalityChoiceJumpTo": set_choice_jump,
-            "SetPersonalityChoiceRollover": set_choice_rollover,
-            "SetPersonalityChoiceEnd": set_choice_end,
-            "SetMajorChoice": set_major_choice,
-            "SetMajorChoiceJumpTo": set_choice_jump,
-            "SetMajorChoiceRollover": set_choice_rollover,
-            "SetMajorChoiceEnd": set_choice_end,
-            "SetPhoneMsgChoiceBegin": set_phone_msg_choice_begin,
-            "SetPhoneMsgChoiceJumpTo": set_choice_jump,
-            "SetPhoneMsgChoiceRollover": set_choice_rollover,
-            "SetPhoneMsgChoiceEnd": set_choice_end,
-            "End": lambda: None,
-        }
-
-        if cmd in dispatcher:
-            dispatcher[cmd]()
 
+def parse_story_episode(episode_id: str, data: Any,
+                        interpreter: type[StoryInterpreter] = StoryInterpreter) -> StoryEpisode:
+    title, subtitle, description = parse_story_intro(data)
+    rows = interpreter().run(data)
     return StoryEpisode(episode_id, title, subtitle, description, rows)
 
 
-@cache
-def load_story_files() -> dict[str, dict | list]:
-    result = {}
+def _main_story_ids() -> list[str]:
+    result = []
     for chapter in range(0, 10):
         for episode in range(0, 20):
             for suffix in ["", "_a", "_b", "_c"]:
-                filename = f"stm{chapter:02d}_{episode:02d}{suffix}.lua"
-                full_path = "game/ui/avg/_en/config/" + filename
-                table = load_lua_table(full_path)
-                if table is not None:
-                    result[filename.split(".")[0]] = table
+                story_id = f"stm{chapter:02d}_{episode:02d}{suffix}"
+                if story_config_exists(story_id):
+                    result.append(story_id)
     return result
 
 
 @cache
-def get_story_episodes() -> dict[str, StoryEpisode]:
-    result: dict[str, StoryEpisode] = {}
+def load_story_files() -> dict[str, dict | list]:
+    return {story_id: load_story_config(story_id) for story_id in _main_story_ids()}
+
 
-    episode_files = load_story_files()
+@cache
+def _story_context_fingerprint() -> str:
+    """Everything besides the episode's own Lua file that a parse depends on."""
+    digest = xxhash.xxh3_64(str(PARSER_VERSION).encode())
+    for file_name in STORY_CONTEXT_TABLES:
+        path = lua_path(file_name)
+        digest.update(path.read_bytes() if path is not None else b"")
+    return digest.hexdigest()
+
+
+def _read_cached_episode(story_id: str, key: str) -> StoryEpisode | None:
+    path = STORY_CACHE_DIR / f"{story_id}.pickle"
+    if not path.exists():
+        return None
+    try:
+        with open(path, "rb") as f:
+            cached_key, episode = pickle.load(f)
+    except Exception:
+        return None
+    return episode if cached_key == key else None
+
+
+def _write_cached_episode(story_id: str, key: str, episode: StoryEpisode) -> None:
+    STORY_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = STORY_CACHE_DIR / f"{story_id}.pickle"
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump((key, episode), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def parse_story_configs(story_ids: Iterable[str], jobs: int | None = None) -> dict[str, StoryEpisode]:
+    """Parse many episodes, keyed by normalized story id; ids without a config are left out.
+
+    Each parse is cached under the hash of its Lua file and `_story_context_fingerprint`,
+    so only new or changed episodes are decoded and parsed again, across a process
+    pool when there are enough of them.
+    """
+    story_ids = list(dict.fromkeys(normalize_story_id(story_id) for story_id in story_ids))
+    context = _story_context_fingerprint()
+    episodes: dict[str, StoryEpisode] = {}
+    keys: dict[str, str] = {}
+    for story_id in story_ids:
+        path = lua_path(_story_config_name(story_id))
+        if path is None:
+            continue
+        key = f"{context}:{xxhash.xxh3_64_hexdigest(path.read_bytes())}"
+        episode = _read_cached_episode(story_id, key)
+        if episode is not None:
+            episodes[story_id] = episode
+        else:
+            keys[story_id] = key
+
+    misses = list(keys)
+    if misses:
+        print(f"Parsing {len(misses)} story episodes ({len(episodes)} cached)")
+    workers = min(jobs or max(os.cpu_count() - 4, 4), len(misses) // EPISODES_PER_TASK)
+    if workers <= 1:
+        parsed = map(parse_story_config, misses)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = list(pool.map(parse_story_config, misses, chunksize=EPISODES_PER_TASK))
+    for story_id, episode in zip(misses, parsed):
+        if episode is None:
+            continue
+        _write_cached_episode(story_id, keys[story_id], episode)
+        episodes[story_id] = episode
+    return {story_id: episodes[story_id] for story_id in story_ids if story_id in episodes}
 
-    for filename, data in episode_files.items():
-        episode = parse_story_episode(filename, data)
-        result[filename] = episode
 
-    return result
+@cache
+def get_story_episodes() -> dict[str, StoryEpisode]:
+    return parse_story_configs(_main_story_ids())
 
 
 def main():
@@ -1,77 +1,86 @@
+from dataclasses import dataclass, field
+
 from story.parse_story import StoryEpisode
-from story.story_audio import get_bgm_path, get_sound_effect_path
+from story.story_audio import schedule_bgm, schedule_sound_effect
 from utils.data_utils import assets_root
 from utils.upload_utils import UploadRequest, process_uploads
 
 
+@dataclass
+class StoryAssetIndex:
+    """The name of every asset the episodes refer to, collected in one pass over their rows."""
+    bgm: set[str] = field(default_factory=set)
+    sound_effects: set[str] = field(default_factory=set)
+    front_objects: set[str] = field(default_factory=set)
+
+    @classmethod
+    def build(cls, episodes: dict[str, StoryEpisode]) -> "StoryAssetIndex":
+        index = cls()
+        for episode in episodes.values():
+            for row in episode.rows:
+                if row.name == "bgm":
+                    bgm_file = row.attributes.get("file", "")
+                    if bgm_file:
+                        index.bgm.add(bgm_file)
+                elif row.name == "sound_effect":
+                    for se_file in row.attributes.get("files", "").split(","):
+                        if se_file:
+                            index.sound_effects.add(se_file)
+                elif row.name == "front_object":
+                    image_name = row.attributes.get("image", "")
+                    if image_name:
+                        index.front_objects.add(image_name)
+        return index
+
+
 def get_front_object_file_name(image_name: str) -> str:
     return f"Story element {image_name}.png"
 
 
-def export_bgm_files(episodes: dict[str, StoryEpisode]) -> None:
-    bgm_files: set[str] = set()
-    for episode in episodes.values():
-        for row in episode.rows:
-            if row.name == "bgm":
-                bgm_file = row.attributes.get("file", "")
-                if bgm_file:
-                    bgm_files.add(bgm_file)
+def bgm_upload_requests(index: StoryAssetIndex) -> list[UploadRequest]:
+    # Missing oggs render on the transcoding pool; each upload waits for its own file.
     upload_requests = []
-    for bgm in sorted(bgm_files):
+    for bgm in sorted(index.bgm):
         if not bgm.startswith("m"):
             print(f"WARNING: unrecognized bgm name: {bgm}")
             continue
         try:
-            path = get_bgm_path(bgm)
+            rendered = schedule_bgm(bgm)
         except KeyError:
             print(f"WARNING: Could not find BGM asset for {bgm}")
             continue
         upload_requests.append(UploadRequest(
-            path,
+            rendered.result,
             f"File:Bg{bgm}.ogg",
             "[[Category:Story BGMs]]",
             'batch upload story bgms')
         )
-    process_uploads(upload_requests)
+    return upload_requests
 
 
-def export_sound_effects(episodes: dict[str, StoryEpisode]) -> None:
-    sound_effects: set[str] = set()
-    for episode in episodes.values():
-        for row in episode.rows:
-            if row.name == "sound_effect":
-                for se_file in row.attributes.get("files", "").split(","):
-                    if se_file:
-                        sound_effects.add(se_file)
+def sound_effect_upload_requests(index: StoryAssetIndex) -> list[UploadRequest]:
+    # Missing oggs render on the transcoding pool; each upload waits for its own file.
     upload_requests = []
-    for se in sorted(sound_effects):
+    for se in sorted(index.sound_effects):
         if not se.startswith("se"):
             continue
         if "stop" in se:
             continue
-        path = get_sound_effect_path(se)
-        if path is None:
+        rendered = schedule_sound_effect(se)
+        if rendered is None:
             continue
         upload_requests.append(UploadRequest(
-            path,
+            rendered.result,
             f"File:{se}.ogg",
             "[[Category:Sound effects]]",
             'batch upload story sound effects')
         )
-    process_uploads(upload_requests)
-
+    return upload_requests
 
-def export_front_object_files(episodes: dict[str, StoryEpisode]) -> None:
-    image_names: set[str] = set()
-    for episode in episodes.values():
-        for row in episode.rows:
-            if row.name == "front_object":
-                image_name = row.attributes.get("image", "")
-                if image_name:
-                    image_names.add(image_name)
 
+def front_object_upload_requests(index: StoryAssetIndex) -> list[UploadRequest]:
     upload_requests = []
-    for image_name in sorted(image_names):
+    for image_name in sorted(index.front_objects):
         path = assets_root / "icon" / "avgelement" / f"{image_name}.png"
         if not path.exists():
             print(f"WARNING: Could not find front object asset for {image_name}")
@@ -82,10 +91,14 @@ def export_front_object_files(episodes: dict[str, StoryEpisode]) -> None:
             "[[Category:Story element images]]",
             "batch upload story element images"
         ))
-    process_uploads(upload_requests)
+    return upload_requests
 
 
 def export_story_assets(episodes: dict[str, StoryEpisode]) -> None:
-    export_bgm_files(episodes)
-    export_sound_effects(episodes)
-    export_front_object_files(episodes)
+    """Upload every asset the episodes use, checking which already exist in one batch."""
+    index = StoryAssetIndex.build(episodes)
+    process_uploads(
+        bgm_upload_requests(index)
+        + sound_effect_upload_requests(index)
+        + front_object_upload_requests(index)
+    )
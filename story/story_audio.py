@@ -1,7 +1,10 @@
+import os
 import re
 import shutil
 import subprocess
 import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from functools import cache
 from pathlib import Path
 
@@ -11,6 +14,18 @@ from unpack.unpack_paths import sound_dir
 from utils.audio_utils import wwise_fnv_hash, get_wwiser_executable_path
 from utils.data_utils import audio_wav_root
 
+# vgmstream and ffmpeg do the work in subprocesses, so threads are enough to run them side by side.
+TRANSCODE_WORKERS = max(os.cpu_count() - 4, 4)
+
+_rendering: dict[Path, Future[Path]] = {}
+_rendering_lock = threading.Lock()
+
+
+@cache
+def transcode_pool() -> ThreadPoolExecutor:
+    """Shared by every story audio export in the process."""
+    return ThreadPoolExecutor(max_workers=TRANSCODE_WORKERS, thread_name_prefix="transcode")
+
 
 @cache
 def get_hash_to_txtp_mapping() -> dict[str, Path]:
@@ -38,22 +53,50 @@ def get_hash_to_txtp_mapping() -> dict[str, Path]:
     return result
 
 
-def get_sound_effect_path(name: str) -> Path | None:
+def _render_ogg(txtp_path: Path | None, wav_path: Path, ogg_path: Path) -> Path:
+    if not wav_path.exists():
+        txtp_to_wav(txtp_path, wav_path)
+    wav_to_ogg(wav_path, ogg_path)
+    return ogg_path
+
+
+def _schedule_render(txtp_path: Path | None, wav_path: Path, ogg_path: Path) -> Future[Path]:
+    """Render `ogg_path` on the transcoding pool, at most once however often it is asked for."""
+    with _rendering_lock:
+        future = _rendering.get(ogg_path)
+        if future is None:
+            future = _rendering[ogg_path] = transcode_pool().submit(_render_ogg, txtp_path, wav_path, ogg_path)
+        return future
+
+
+def _done(path: Path) -> Future[Path]:
+    future: Future[Path] = Future()
+    future.set_result(path)
+    return future
+
+
+def schedule_sound_effect(name: str) -> Future[Path] | None:
+    """The sound effect's ogg, rendered in the background if it is not there yet; None if it has no txtp."""
     hashed = wwise_fnv_hash(name)
     sound_effect_root = audio_wav_root / "se"
     sound_effect_root.mkdir(parents=True, exist_ok=True)
     se_ogg_root = sound_effect_root / "ogg"
     se_ogg_root.mkdir(parents=True, exist_ok=True)
     ogg_path = se_ogg_root / f"{name}.ogg"
-    if not ogg_path.exists():
-        wav_path = sound_effect_root / f"{name}.wav"
-        if not wav_path.exists():
-            txtp_path = get_hash_to_txtp_mapping().get(str(hashed), None)
-            if txtp_path is None:
-                return None
-            txtp_to_wav(txtp_path, wav_path)
-        wav_to_ogg(wav_path, ogg_path)
-    return ogg_path
+    if ogg_path.exists():
+        return _done(ogg_path)
+    wav_path = sound_effect_root / f"{name}.wav"
+    txtp_path = None
+    if not wav_path.exists():
+        txtp_path = get_hash_to_txtp_mapping().get(str(hashed), None)
+        if txtp_path is None:
+            return None
+    return _schedule_render(txtp_path, wav_path, ogg_path)
+
+
+def get_sound_effect_path(name: str) -> Path | None:
+    future = schedule_sound_effect(name)
+    return None if future is None else future.result()
 
 
 @cache
@@ -82,17 +125,25 @@ def get_bgm_hash_to_txtp_mapping() -> dict[str, Path]:
     return result
 
 
-def get_bgm_path(name: str) -> Path:
+def schedule_bgm(name: str) -> Future[Path]:
+    """The BGM's ogg, rendered in the background if it is not there yet.
+
+    Raises KeyError straight away if the BGM has no txtp.
+    """
     bgm_root = audio_wav_root / "bgm"
     bgm_root.mkdir(parents=True, exist_ok=True)
     bgm_ogg_root = bgm_root / "ogg"
     bgm_ogg_root.mkdir(parents=True, exist_ok=True)
     ogg_path = bgm_ogg_root / f"{name}.ogg"
-    if not ogg_path.exists():
-        wav_path = bgm_root / f"{name}.wav"
-        if not wav_path.exists():
-            hashed = wwise_fnv_hash(name)
-            txtp_path = get_bgm_hash_to_txtp_mapping()[str(hashed)]
-            txtp_to_wav(txtp_path, wav_path)
-        wav_to_ogg(wav_path, ogg_path)
-    return ogg_path
+    if ogg_path.exists():
+        return _done(ogg_path)
+    wav_path = bgm_root / f"{name}.wav"
+    txtp_path = None
+    if not wav_path.exists():
+        hashed = wwise_fnv_hash(name)
+        txtp_path = get_bgm_hash_to_txtp_mapping()[str(hashed)]
+    return _schedule_render(txtp_path, wav_path, ogg_path)
+
+
+def get_bgm_path(name: str) -> Path:
+    return schedule_bgm(name).result()
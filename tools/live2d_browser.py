@@ -3,7 +3,10 @@ from __future__ import annotations
 import argparse
 import contextlib
 import functools
+import gzip
+import http
 import http.server
+import io
 import os
 import shutil
 import socket
@@ -11,9 +14,10 @@ import socketserver
 import threading
 import time
 import urllib.parse
-from dataclasses import dataclass
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Iterator
+from typing import Any, BinaryIO, Callable, Iterable, Iterator
 
 from playwright.sync_api import Browser, Page, sync_playwright
 
@@ -41,6 +45,175 @@ class QuietRequestHandler(http.server.SimpleHTTPRequestHandler):
         return
 
 
+# JSON is the only text the viewer fetches in bulk (model and motion files);
+# moc3 and PNG data gains next to nothing from compression.
+COMPRESSIBLE_SUFFIXES = (".json",)
+DEFAULT_ASSET_CACHE_BYTES = 512 * 1024 * 1024
+
+
+@functools.cache
+def _brotli_compress() -> Callable[[bytes], bytes] | None:
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress
+
+
+@dataclass
+class CachedAsset:
+    data: bytes
+    etag: str
+    mtime: float
+    encoded: dict[str, bytes] = field(default_factory=dict)
+
+    @property
+    def size(self) -> int:
+        return len(self.data) + sum(len(body) for body in self.encoded.values())
+
+    def compress(self, encoding: str) -> bytes:
+        if encoding == "br":
+            return _brotli_compress()(self.data)
+        return gzip.compress(self.data, compresslevel=6)
+
+
+def _etag(stat: os.stat_result) -> str:
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+class AssetCache:
+    """File bytes kept in memory, least recently used out first.
+
+    An entry is keyed on the file's mtime and size as well as its path, so a
+    re-exported model is read again rather than served stale.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_ASSET_CACHE_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[Path, CachedAsset] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, path: Path, stat: os.stat_result | None = None) -> CachedAsset:
+        stat = stat or path.stat()
+        etag = _etag(stat)
+        with self._lock:
+            asset = self._entries.get(path)
+            if asset is not None and asset.etag == etag:
+                self._entries.move_to_end(path)
+                return asset
+        asset = CachedAsset(path.read_bytes(), etag, stat.st_mtime)
+        self._store(path, asset)
+        return asset
+
+    def encoded(self, path: Path, asset: CachedAsset, encoding: str) -> bytes:
+        with self._lock:
+            body = asset.encoded.get(encoding)
+        if body is not None:
+            return body
+        # Compress outside the lock; if another request got there first, its copy wins.
+        body = asset.compress(encoding)
+        with self._lock:
+            if encoding in asset.encoded:
+                return asset.encoded[encoding]
+            asset.encoded[encoding] = body
+            if self._entries.get(path) is asset:
+                self._size += len(body)
+                self._evict()
+        return body
+
+    def preload(self, paths: Iterable[Path]) -> None:
+        """Read files ahead of their first request, stopping once the cache is full."""
+        for path in paths:
+            if self._size + path.stat().st_size > self.max_bytes:
+                return
+            self.get(path)
+
+    def _store(self, path: Path, asset: CachedAsset) -> None:
+        with self._lock:
+            previous = self._entries.pop(path, None)
+            if previous is not None:
+                self._size -= previous.size
+            if asset.size > self.max_bytes:
+                return
+            self._entries[path] = asset
+            self._size += asset.size
+            self._evict()
+
+    def _evict(self) -> None:
+        # Callers hold the lock.
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= evicted.size
+
+
+class CachedRequestHandler(QuietRequestHandler):
+    """Serves files from an `AssetCache` with ETag revalidation.
+
+    `no-cache` lets the browser keep every texture and motion but confirm it is
+    current with a 304, which costs a stat here instead of a re-transfer.
+    Directory listings, which the viewer scrapes for models, are left to the
+    base class.
+    """
+
+    def __init__(self, *args: Any, assets: AssetCache, **kwargs: Any) -> None:
+        self.assets = assets
+        super().__init__(*args, **kwargs)
+
+    def _accepted_encoding(self, path: Path) -> str | None:
+        if path.suffix not in COMPRESSIBLE_SUFFIXES:
+            return None
+        accepted = {
+            part.split(";")[0].strip()
+            for part in self.headers.get("Accept-Encoding", "").split(",")
+        }
+        if "br" in accepted and _brotli_compress() is not None:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def send_head(self) -> BinaryIO | None:
+        request_path = urllib.parse.urlsplit(self.path).path
+        path = Path(self.translate_path(self.path))
+        if request_path.endswith("/") or not path.is_file():
+            return super().send_head()
+        try:
+            stat = path.stat()
+        except OSError:
+            self.send_error(http.HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        etag = _etag(stat)
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(http.HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            return None
+
+        try:
+            asset = self.assets.get(path, stat)
+        except OSError:
+            self.send_error(http.HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        encoding = self._accepted_encoding(path)
+        body = asset.data if encoding is None else self.assets.encoded(path, asset, encoding)
+        self.send_response(http.HTTPStatus.OK)
+        self.send_header("Content-Type", self.guess_type(str(path)))
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Last-Modified", self.date_time_string(asset.mtime))
+        self.send_header("ETag", asset.etag)
+        self.send_header("Cache-Control", "no-cache")
+        if path.suffix in COMPRESSIBLE_SUFFIXES:
+            self.send_header("Vary", "Accept-Encoding")
+        if encoding is not None:
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        return io.BytesIO(body)
+
+
 class ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
     allow_reuse_address = True
     daemon_threads = True
@@ -67,12 +240,21 @@ def _find_free_port(host: str) -> int:
 
 
 @contextlib.contextmanager
-def _static_server(root: Path, host: str, port: int) -> Iterator[ServerInfo]:
+def _static_server(
+    root: Path,
+    host: str,
+    port: int,
+    preload: Iterable[Path] = (),
+    cache_bytes: int = DEFAULT_ASSET_CACHE_BYTES,
+) -> Iterator[ServerInfo]:
     actual_port = port if port else _find_free_port(host)
-    handler = functools.partial(QuietRequestHandler, directory=str(root))
+    assets = AssetCache(cache_bytes)
+    handler = functools.partial(CachedRequestHandler, directory=str(root), assets=assets)
     server = ThreadingTCPServer((host, actual_port), handler)
     thread = threading.Thread(target=server.serve_forever, daemon=True)
     thread.start()
+    # Warm the cache in the background; requests that race it just read the file.
+    threading.Thread(target=assets.preload, args=(list(preload),), daemon=True).start()
 
     try:
         yield ServerInfo(root=root, host=host, port=actual_port)
@@ -174,6 +356,15 @@ def _wait_until_loaded(page: Page, timeout_ms: int) -> None:
     )
 
 
+def _advance_frames(page: Page, seconds: float) -> None:
+    """Step a capture-mode viewer's motion forward by `seconds`, then render once.
+
+    Zero only renders, which a capture needs after moving the model because the
+    ticker that would otherwise redraw it is stopped.
+    """
+    page.evaluate("(seconds) => advanceFrames(seconds)", seconds)
+
+
 def _take_live2d_screenshot(
     page: Page,
     output: Path,
@@ -184,6 +375,7 @@ def _take_live2d_screenshot(
     full_page: bool,
     timeout_ms: int,
     settle_ms: int,
+    capture_mode: bool = False,
 ) -> None:
     page.wait_for_selector("#modelSelect option", state="attached", timeout=timeout_ms)
     _wait_until_loaded(page, timeout_ms)
@@ -204,7 +396,10 @@ def _take_live2d_screenshot(
     if hide_ui:
         page.add_style_tag(content="#controls, #status { display: none !important; }")
 
-    page.wait_for_timeout(settle_ms)
+    if capture_mode:
+        _advance_frames(page, settle_ms / 1000)
+    else:
+        page.wait_for_timeout(settle_ms)
     output.parent.mkdir(parents=True, exist_ok=True)
     page.screenshot(path=str(output), full_page=full_page)
 
@@ -236,6 +431,8 @@ def _run(args: argparse.Namespace) -> None:
             url = _with_query_param(url, "mouseTracking", "1")
         if args.render_resolution:
             url = _with_query_param(url, "renderResolution", args.render_resolution)
+        if args.capture_mode:
+            url = _with_query_param(url, "capture", "1")
         print(f"Opening {url}")
 
         browser = _launch_browser(args.headed)
@@ -257,6 +454,7 @@ def _run(args: argparse.Namespace) -> None:
                 full_page=args.full_page,
                 timeout_ms=args.timeout,
                 settle_ms=args.settle,
+                capture_mode=args.capture_mode,
             )
             print(f"Wrote screenshot: {args.output}")
 
@@ -287,6 +485,11 @@ def main() -> None:
     parser.add_argument("--device-scale-factor", type=float, default=1, help="Browser device scale factor")
     parser.add_argument("--timeout", type=int, default=60000, help="Navigation and selector timeout in milliseconds")
     parser.add_argument("--settle", type=int, default=1000, help="Milliseconds to wait before screenshot")
+    parser.add_argument(
+        "--capture-mode",
+        action="store_true",
+        help="Stop the viewer's ticker and advance the motion by --settle milliseconds instead of waiting",
+    )
     parser.add_argument("--hide-ui", action="store_true", help="Hide viewer controls and status before taking the screenshot")
     parser.add_argument("--full-page", action="store_true", help="Capture the full page instead of only the viewport")
     parser.add_argument("--headed", action="store_true", help="Show the browser window")
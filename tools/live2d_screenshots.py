@@ -1,9 +1,14 @@
 from __future__ import annotations
 
 import argparse
+import contextlib
+import functools
+import queue
 import struct
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Callable
 
 import cv2
 import numpy as np
@@ -13,6 +18,7 @@ from tools.live2d_browser import (
     DEFAULT_VIEWER_PATH,
     REPO_ROOT,
     ServerInfo,
+    _advance_frames,
     _close_browser,
     _launch_browser,
     _parse_viewport,
@@ -31,6 +37,9 @@ DEFAULT_SCALE = 0.9
 DEFAULT_FIT_MARGIN = 0.9
 MIN_OUTPUT_SIZE = 2048
 MAX_FIT_ATTEMPTS = 6
+# Resolution, relative to CSS pixels, that fit attempts measure the model at. The
+# bounds only steer the scale; the saved screenshot is trimmed at full size.
+ALPHA_SAMPLE_RESOLUTION = 0.25
 
 
 @dataclass(frozen=True)
@@ -208,6 +217,88 @@ def _fit_rendered_bounds(page: Page, margin: float) -> None:
     )
 
 
+def _rendered_alpha_bounds(page: Page, alpha_threshold: int) -> AlphaBounds:
+    """Alpha bounds of the model as a screenshot would see them, measured in the page.
+
+    The stage is rendered into a small render texture and its pixels read back
+    directly, which is far cheaper than a full-size PNG screenshot per attempt.
+    """
+    bounds = page.evaluate(
+        """({ threshold, sampleResolution }) => {
+            if (typeof currentModel === "undefined" || typeof app === "undefined" || !currentModel || !app) {
+              throw new Error("Viewer model globals are not available");
+            }
+
+            const target = PIXI.RenderTexture.create({
+              width: window.innerWidth,
+              height: window.innerHeight,
+              resolution: sampleResolution
+            });
+            try {
+              app.renderer.render(app.stage, { renderTexture: target, clear: true });
+              // Render texture pixels come back top row first, unlike the canvas.
+              const pixels = app.renderer.extract.pixels(target);
+              const width = target.baseTexture.realWidth;
+              const height = target.baseTexture.realHeight;
+              let top = -1;
+              let bottom = -1;
+              let left = width;
+              let right = -1;
+              for (let y = 0; y < height; y++) {
+                const alpha = y * width * 4 + 3;
+                let first = 0;
+                while (first < width && pixels[alpha + first * 4] <= threshold) {
+                  first++;
+                }
+                if (first === width) {
+                  continue;
+                }
+                let last = width - 1;
+                while (pixels[alpha + last * 4] <= threshold) {
+                  last--;
+                }
+                if (top < 0) {
+                  top = y;
+                }
+                bottom = y;
+                left = Math.min(left, first);
+                right = Math.max(right, last);
+              }
+              if (top < 0) {
+                return null;
+              }
+
+              const ratio = window.devicePixelRatio || 1;
+              const imageWidth = Math.round(window.innerWidth * ratio);
+              const imageHeight = Math.round(window.innerHeight * ratio);
+              const toImageX = imageWidth / width;
+              const toImageY = imageHeight / height;
+              return {
+                left: Math.floor(left * toImageX),
+                top: Math.floor(top * toImageY),
+                right: Math.min(imageWidth, Math.ceil((right + 1) * toImageX)),
+                bottom: Math.min(imageHeight, Math.ceil((bottom + 1) * toImageY)),
+                imageWidth,
+                imageHeight
+              };
+            } finally {
+              target.destroy(true);
+            }
+        }""",
+        {"threshold": alpha_threshold, "sampleResolution": ALPHA_SAMPLE_RESOLUTION},
+    )
+    if bounds is None:
+        raise RuntimeError("Rendered Live2D model is fully transparent")
+    return AlphaBounds(
+        left=bounds["left"],
+        top=bounds["top"],
+        right=bounds["right"],
+        bottom=bounds["bottom"],
+        image_width=bounds["imageWidth"],
+        image_height=bounds["imageHeight"],
+    )
+
+
 def _adjust_to_alpha_bounds(page: Page, bounds: AlphaBounds, fit_margin: float, min_size: int) -> None:
     scale_factor = 1.0
     max_side = max(bounds.width, bounds.height)
@@ -261,6 +352,7 @@ def _load_model_url(server: ServerInfo, viewer_path: str, model: TalentModel, sc
         ("model", model.viewer_path),
         ("scale", str(scale)),
         ("renderResolution", DEFAULT_RENDER_RESOLUTION),
+        ("capture", "1"),
     ):
         url = _with_query_param(url, name, value)
     return url
@@ -300,13 +392,12 @@ def _capture_model(
             }
         """,
     )
-    page.wait_for_timeout(settle_ms)
+    _advance_frames(page, settle_ms / 1000)
     _fit_rendered_bounds(page, fit_margin)
     output.parent.mkdir(parents=True, exist_ok=True)
 
     for attempt in range(max_fit_attempts + 1):
-        page.screenshot(path=str(output), full_page=False, omit_background=True)
-        _, bounds = _read_image_and_alpha_bounds(output, alpha_threshold)
+        bounds = _rendered_alpha_bounds(page, alpha_threshold)
         if not bounds.touches_edge and max(bounds.width, bounds.height) >= min_size:
             break
         if attempt == max_fit_attempts:
@@ -318,8 +409,9 @@ def _capture_model(
             fit_margin=fit_margin,
             min_size=min_size,
         )
-        page.wait_for_timeout(100)
 
+    _advance_frames(page, 0)
+    page.screenshot(path=str(output), full_page=False, omit_background=True)
     return _trim_transparent_borders(
         path=output,
         alpha_threshold=alpha_threshold,
@@ -327,6 +419,63 @@ def _capture_model(
     )
 
 
+def _capture_worker(
+    work: queue.SimpleQueue[tuple[int, TalentModel, Path]],
+    total: int,
+    capture: Callable[..., tuple[int, int]],
+    viewport: tuple[int, int],
+    device_scale_factor: float,
+    min_size: int,
+    headed: bool,
+) -> tuple[list[tuple[int, ScreenshotResult]], list[tuple[TalentModel, str]]]:
+    """Capture models from the queue on one page until the queue is empty.
+
+    A model that fails costs only its own screenshot: its page is thrown away and
+    the next model starts on a fresh one, so a lost WebGL context or a stuck load
+    cannot carry over.
+    """
+    results: list[tuple[int, ScreenshotResult]] = []
+    failures: list[tuple[TalentModel, str]] = []
+    width, height = viewport
+    browser = _launch_browser(headed)
+    try:
+        context = browser.new_context(
+            viewport={"width": width, "height": height},
+            device_scale_factor=device_scale_factor,
+        )
+        page = context.new_page()
+        while True:
+            try:
+                index, model, output = work.get_nowait()
+            except queue.Empty:
+                break
+            print(f"[{index}/{total}] Capturing {model.skin_id}: {output}")
+            try:
+                image_width, image_height = capture(page=page, model=model, output=output)
+                if max(image_width, image_height) < min_size:
+                    raise RuntimeError(
+                        f"Trimmed screenshot is {image_width}x{image_height}, below {min_size}px minimum",
+                    )
+                print(f"  {model.skin_id}: wrote {image_width}x{image_height}")
+                results.append((index, ScreenshotResult(
+                    skin_id=model.skin_id,
+                    model_path=model.model_path,
+                    output_path=output,
+                    skipped=False,
+                    image_width=image_width,
+                    image_height=image_height,
+                )))
+            except Exception as error:
+                failures.append((model, str(error)))
+                print(f"  {model.skin_id}: ERROR: {error}")
+                with contextlib.suppress(Exception):
+                    page.close()
+                page = context.new_page()
+    finally:
+        _close_browser(browser)
+    return results, failures
+
+
 def capture_talent_screenshots(
     *,
     root: Path = REPO_ROOT,
@@ -347,6 +496,7 @@ def capture_talent_screenshots(
     timeout: int = 60000,
     settle: int = 1500,
     headed: bool = False,
+    jobs: int = 1,
 ) -> list[ScreenshotResult]:
     if min_size < MIN_OUTPUT_SIZE:
         raise ValueError(f"--min-size must be at least {MIN_OUTPUT_SIZE}")
@@ -358,6 +508,8 @@ def capture_talent_screenshots(
         raise ValueError("--crop-padding must be non-negative")
     if max_fit_attempts < 0:
         raise ValueError("--max-fit-attempts must be non-negative")
+    if jobs < 1:
+        raise ValueError("--jobs must be at least 1")
 
     models = _discover_talent_models(set(skin_ids) if skin_ids else None)
     if limit is not None:
@@ -392,51 +544,51 @@ def capture_talent_screenshots(
         print(f"Wrote screenshots to {output_root}")
         return results
 
-    with _static_server(root, host, port) as server:
-        browser = _launch_browser(headed)
-        try:
-            context = browser.new_context(
-                viewport={"width": width, "height": height},
-                device_scale_factor=device_scale_factor,
-            )
-            page = context.new_page()
-
-            for index, model, output in pending:
-                print(f"[{index}/{len(models)}] Capturing {model.skin_id}: {output}")
-                try:
-                    image_width, image_height = _capture_model(
-                        page=page,
-                        server=server,
-                        viewer_path=viewer_path,
-                        model=model,
-                        output=output,
-                        scale=scale,
-                        timeout_ms=timeout,
-                        settle_ms=settle,
-                        alpha_threshold=alpha_threshold,
-                        crop_padding=crop_padding,
-                        fit_margin=fit_margin,
-                        min_size=min_size,
-                        max_fit_attempts=max_fit_attempts,
-                    )
-                    if max(image_width, image_height) < min_size:
-                        raise RuntimeError(
-                            f"Trimmed screenshot is {image_width}x{image_height}, below {min_size}px minimum",
-                        )
-                    print(f"  wrote {image_width}x{image_height}")
-                    results.append(ScreenshotResult(
-                        skin_id=model.skin_id,
-                        model_path=model.model_path,
-                        output_path=output,
-                        skipped=False,
-                        image_width=image_width,
-                        image_height=image_height,
-                    ))
-                except Exception as error:
-                    failures.append((model, str(error)))
-                    print(f"  ERROR: {error}")
-        finally:
-            _close_browser(browser)
+    work: queue.SimpleQueue[tuple[int, TalentModel, Path]] = queue.SimpleQueue()
+    for item in pending:
+        work.put(item)
+
+    # Every pending model's moc, textures and motions, in the order they will be asked for.
+    preload = [path for _, model, _ in pending for path in sorted(model.model_path.parent.rglob("*")) if path.is_file()]
+    with _static_server(root, host, port, preload=preload) as server:
+        capture = functools.partial(
+            _capture_model,
+            server=server,
+            viewer_path=viewer_path,
+            scale=scale,
+            timeout_ms=timeout,
+            settle_ms=settle,
+            alpha_threshold=alpha_threshold,
+            crop_padding=crop_padding,
+            fit_margin=fit_margin,
+            min_size=min_size,
+            max_fit_attempts=max_fit_attempts,
+        )
+        worker = functools.partial(
+            _capture_worker,
+            work=work,
+            total=len(models),
+            capture=capture,
+            viewport=viewport,
+            device_scale_factor=device_scale_factor,
+            min_size=min_size,
+            headed=headed,
+        )
+        jobs = max(1, min(jobs, len(pending)))
+        if jobs == 1:
+            outcomes = [worker()]
+        else:
+            # The sync API is bound to the thread that started it, so each worker
+            # runs a browser of its own; they share the one static server.
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                outcomes = [future.result() for future in [pool.submit(worker) for _ in range(jobs)]]
+
+    captured = sorted((item for worker_results, _ in outcomes for item in worker_results), key=lambda item: item[0])
+    results.extend(result for _, result in captured)
+    failures.extend(sorted(
+        (item for _, worker_failures in outcomes for item in worker_failures),
+        key=lambda item: item[0].skin_id,
+    ))
 
     if failures:
         print("\nLive2D screenshots with errors:")
@@ -469,6 +621,7 @@ def _run(args: argparse.Namespace) -> None:
             timeout=args.timeout,
             settle=args.settle,
             headed=args.headed,
+            jobs=args.jobs,
         )
     except RuntimeError as error:
         raise SystemExit(str(error)) from None
@@ -494,8 +647,9 @@ def main() -> None:
     parser.add_argument("--max-fit-attempts", type=int, default=MAX_FIT_ATTEMPTS, help="Maximum alpha-feedback fit attempts before cropping")
     parser.add_argument("--device-scale-factor", type=float, default=1, help="Browser device scale factor")
     parser.add_argument("--timeout", type=int, default=60000, help="Navigation and selector timeout in milliseconds")
-    parser.add_argument("--settle", type=int, default=1500, help="Milliseconds to wait before screenshot")
+    parser.add_argument("--settle", type=int, default=1500, help="Milliseconds of motion to advance before screenshot")
     parser.add_argument("--headed", action="store_true", help="Show the browser window")
+    parser.add_argument("--jobs", type=int, default=1, help="Models to capture at once, each in its own browser")
     args = parser.parse_args()
 
     _run(args)
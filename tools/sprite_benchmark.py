@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import multiprocessing
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from character_info.char_sprites import (
+    CANVAS_ANCHOR,
+    CANVAS_SIZE,
+    Sprite,
+    _load_rgba,
+    compose_layers,
+    compute_offsets,
+    find_sprites_in_dir,
+)
+from utils.data_utils import assets_root
+
+try:
+    import resource
+except ImportError:  # Windows: time only.
+    resource = None
+
+
+ENGINES = ("canvas", "numpy")
+
+
+@dataclass
+class Measurement:
+    seconds: float
+    # Peak resident set of the measuring process in MiB, None where unavailable.
+    peak_mib: float | None
+    digest: str
+
+
+def _canvas_compose(base: Sprite, top: Sprite) -> np.ndarray:
+    """The previous composition: two full canvases per expression."""
+    base_image = Image.open(base.source).convert("RGBA")
+    top_image = Image.open(top.source).convert("RGBA")
+    canvas_size = (CANVAS_SIZE, CANVAS_SIZE)
+    canvas1 = Image.new("RGBA", canvas_size, (0, 0, 0, 0))
+    canvas1.paste(base_image, (CANVAS_ANCHOR, CANVAS_ANCHOR))
+    if base_image.size == top_image.size:
+        off_x, off_y = 0, 0
+    else:
+        off_x, off_y = compute_offsets(base.json_data, top.json_data, base_image.size[1], top_image.size[1])
+    canvas2 = Image.new("RGBA", canvas_size, (0, 0, 0, 0))
+    canvas2.paste(top_image, (CANVAS_ANCHOR + off_x, CANVAS_ANCHOR + off_y))
+    combined = Image.alpha_composite(canvas1, canvas2)
+    bbox = combined.getbbox()
+    if bbox:
+        combined = combined.crop(bbox)
+    return np.asarray(combined)
+
+
+def character_variants(char_dir: Path) -> list[list[Sprite]]:
+    variants = []
+    for variant_dir in sorted((char_dir / "atlas_png").iterdir()):
+        if not variant_dir.is_dir():
+            continue
+        sprites = find_sprites_in_dir(variant_dir, variant_dir.name)
+        if len(sprites) > 1:
+            variants.append(sprites)
+    return variants
+
+
+def _measure(char_dir: Path, engine: str, out_dir: Path) -> Measurement:
+    """Compose and save every expression of one character with `engine`.
+
+    Runs in a fresh process so the peak resident set belongs to this character
+    and engine alone.
+    """
+    digest = hashlib.sha1()
+    start = time.perf_counter()
+    for sprites in character_variants(char_dir):
+        base = sprites[0]
+        base_image = _load_rgba(base.source) if engine == "numpy" else None
+        for top in sprites[1:]:
+            if engine == "numpy":
+                image = compose_layers(base_image, base, top)
+            else:
+                image = _canvas_compose(base, top)
+            Image.fromarray(image).save(out_dir / f"{engine}_{top.source.parent.name}_{top.number:03d}.png")
+            digest.update(repr(image.shape).encode())
+            digest.update(np.ascontiguousarray(image).tobytes())
+    seconds = time.perf_counter() - start
+    peak_mib = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS.
+        peak_mib = peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    return Measurement(seconds, peak_mib, digest.hexdigest())
+
+
+def _format_peak(measurement: Measurement) -> str:
+    return "-" if measurement.peak_mib is None else f"{measurement.peak_mib:.0f} MiB"
+
+
+def benchmark(names: list[str] | None = None) -> bool:
+    """Print per-character time and peak memory of both engines.
+
+    Returns False if any character's outputs differ between the engines.
+    """
+    root = assets_root / "actor2d/characteravg"
+    char_dirs = [d for d in sorted(root.iterdir()) if d.is_dir() and (d / "atlas_png").is_dir()]
+    if names:
+        char_dirs = [d for d in char_dirs if d.name in names]
+    context = multiprocessing.get_context("spawn")
+    identical = True
+    totals = {engine: 0.0 for engine in ENGINES}
+    print(f"{'character':<16} {'canvas':>18} {'numpy':>18}  match")
+    with tempfile.TemporaryDirectory() as tmp:
+        for char_dir in char_dirs:
+            if not character_variants(char_dir):
+                continue
+            results: dict[str, Measurement] = {}
+            for engine in ENGINES:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    results[engine] = executor.submit(_measure, char_dir, engine, Path(tmp)).result()
+                totals[engine] += results[engine].seconds
+            match = results["canvas"].digest == results["numpy"].digest
+            identical &= match
+            cells = [f"{results[e].seconds:6.2f}s {_format_peak(results[e]):>9}" for e in ENGINES]
+            print(f"{char_dir.name:<16} {cells[0]:>18} {cells[1]:>18}  {'yes' if match else 'NO'}")
+    print(f"{'total':<16} {totals['canvas']:>7.2f}s{'':<10} {totals['numpy']:>7.2f}s")
+    return identical
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare the canvas and NumPy sprite composition engines per character.",
+    )
+    parser.add_argument("characters", nargs="*", help="characteravg directory names (default: all)")
+    args = parser.parse_args()
+    if not benchmark(args.characters):
+        raise SystemExit("Engines produced different sprites")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+from types import ModuleType
+from typing import Any
+
+from story.parse_story import StoryEpisode, load_story_config, load_story_files, normalize_story_id, \
+    parse_story_episode
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def story_corpus() -> dict[str, Any]:
+    """Every main, character, event and disc story config, loaded up front."""
+    from story.export_char_story import get_char_story_entries
+    from story.export_disc_story import get_disc_story_entries
+    from story.export_event_story import get_event_story_entries
+
+    corpus: dict[str, Any] = dict(load_story_files())
+    for entries in (get_char_story_entries(), get_event_story_entries(), get_disc_story_entries()):
+        for entry in entries:
+            episode_id = normalize_story_id(entry.episode_id)
+            if episode_id not in corpus:
+                corpus[episode_id] = load_story_config(episode_id)
+    return {k: v for k, v in corpus.items() if v is not None}
+
+
+def load_baseline(revision: str) -> ModuleType:
+    """story/parse_story.py as of `revision`, imported under a separate name."""
+    source = subprocess.run(["git", "show", f"{revision}:story/parse_story.py"], cwd=REPO_ROOT,
+                            check=True, capture_output=True, text=True).stdout
+    module = ModuleType("story_baseline_parse_story")
+    # dataclasses look their module up by name.
+    sys.modules[module.__name__] = module
+    exec(compile(source, f"{revision}:story/parse_story.py", "exec"), module.__dict__)
+    return module
+
+
+def _snapshot(episode: StoryEpisode) -> tuple:
+    return (episode.title, episode.subtitle, episode.description,
+            [(row.name, row.attributes) for row in episode.rows])
+
+
+def _time_parser(parse, corpus: dict[str, Any], repeat: int) -> tuple[float, dict[str, Any]]:
+    best = float("inf")
+    episodes = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        episodes = {episode_id: parse(episode_id, data) for episode_id, data in corpus.items()}
+        best = min(best, time.perf_counter() - start)
+    return best, episodes
+
+
+def benchmark(revision: str, repeat: int = 3) -> bool:
+    """Parse the whole corpus with the baseline and the current parser; False if they disagree."""
+    corpus = story_corpus()
+    baseline = load_baseline(revision)
+    rows = sum(len(data) for data in corpus.values())
+    print(f"{len(corpus)} episodes, {rows} command rows, best of {repeat}")
+    # Fill each parser's caches (sex strings, speaker names) outside the timings.
+    _time_parser(baseline.parse_story_episode, corpus, 1)
+    _time_parser(parse_story_episode, corpus, 1)
+    baseline_time, baseline_episodes = _time_parser(baseline.parse_story_episode, corpus, repeat)
+    current_time, current_episodes = _time_parser(parse_story_episode, corpus, repeat)
+    print(f"{revision:<16} {baseline_time:8.3f}s")
+    print(f"{'current':<16} {current_time:8.3f}s  ({baseline_time / current_time:.2f}x)")
+    mismatched = [episode_id for episode_id in corpus
+                  if _snapshot(baseline_episodes[episode_id]) != _snapshot(current_episodes[episode_id])]
+    for episode_id in mismatched[:20]:
+        print(f"MISMATCH: {episode_id}")
+    return not mismatched
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Time story parsing over the whole story corpus against an earlier revision of the parser.",
+    )
+    parser.add_argument("revision", help="Git revision whose story/parse_story.py is the baseline")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per parser; the best is reported")
+    args = parser.parse_args()
+    if not benchmark(args.revision, args.repeat):
+        sys.exit("Parsers produced different episodes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable
+
+from tools.story_benchmark import story_corpus
+from utils.data_utils import cn_root, en_root, jp_root, load_json_from_path
+from utils.text_utils import escape_text
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _strings(value: Any, out: list[str]) -> None:
+    if isinstance(value, str):
+        if value:
+            out.append(value)
+    elif isinstance(value, dict):
+        for v in value.values():
+            _strings(v, out)
+    elif isinstance(value, list):
+        for v in value:
+            _strings(v, out)
+
+
+def text_corpus() -> list[str]:
+    """Every string in the story configs and voice bubbles, in file order and with repeats."""
+    texts: list[str] = []
+    for data in story_corpus().values():
+        _strings(data, texts)
+    for path in (jp_root / "bubble/_jp/BubbleData.json", cn_root / "bubble/_cn/BubbleData.json",
+                 en_root / "bubble/_en/BubbleData.json"):
+        bubbles = load_json_from_path(path)
+        if bubbles is not None:
+            _strings([bubble['text'] for bubble in bubbles.values()], texts)
+    return texts
+
+
+def load_baseline(revision: str) -> ModuleType:
+    """utils/text_utils.py as of `revision`, imported under a separate name."""
+    source = subprocess.run(["git", "show", f"{revision}:utils/text_utils.py"], cwd=REPO_ROOT,
+                            check=True, capture_output=True, text=True).stdout
+    module = ModuleType("text_baseline_text_utils")
+    sys.modules[module.__name__] = module
+    exec(compile(source, f"{revision}:utils/text_utils.py", "exec"), module.__dict__)
+    return module
+
+
+def _time_escape(escape: Callable[[str], str], texts: list[str], repeat: int,
+                 before: Callable[[], None] = lambda: None) -> tuple[float, list[str]]:
+    best = float("inf")
+    results = []
+    for _ in range(repeat):
+        before()
+        start = time.perf_counter()
+        results = [escape(text) for text in texts]
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+def benchmark(revision: str, repeat: int = 5) -> bool:
+    """Escape the whole corpus with the baseline and the current escape_text; False if they disagree."""
+    texts = text_corpus()
+    baseline = load_baseline(revision)
+    print(f"{len(texts)} strings ({len(set(texts))} distinct), best of {repeat}")
+    baseline_time, expected = _time_escape(baseline.escape_text, texts, repeat)
+    # Cold: the cache only helps with repeats inside one run. Warm: a second export in the same process.
+    cold_time, actual = _time_escape(escape_text, texts, repeat, escape_text.cache_clear)
+    warm_time, _ = _time_escape(escape_text, texts, repeat)
+    print(f"{revision:<16} {baseline_time:8.3f}s")
+    print(f"{'current (cold)':<16} {cold_time:8.3f}s  ({baseline_time / cold_time:.2f}x)")
+    print(f"{'current (warm)':<16} {warm_time:8.3f}s  ({baseline_time / warm_time:.2f}x)")
+    mismatched = [(text, e, a) for text, e, a in zip(texts, expected, actual) if e != a]
+    for text, e, a in mismatched[:20]:
+        print(f"MISMATCH: {text!r}\n  {revision}: {e!r}\n  current: {a!r}")
+    return not mismatched
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Time escape_text over the story and voice corpus against an earlier revision.",
+    )
+    parser.add_argument("revision", help="Git revision whose utils/text_utils.py is the baseline")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per implementation; the best is reported")
+    args = parser.parse_args()
+    if not benchmark(args.revision, args.repeat):
+        sys.exit("escape_text produced different text")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,26 @@
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
+from functools import partial
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable
 
 import UnityPy
+import numpy as np
 from PIL import Image
 from UnityPy.enums import ClassIDType
 
 from unpack.unpack_paths import data_dir
 from unpack.unpack_utils import get_unity3d_files
 from utils.data_utils import assets_root
+from utils.image_utils import ImageInfo, alpha_composite, image_index
 
 ROOT_SIZE = (2400.0, 1700.0)
 MIN_SPRITE_AREA = 500_000
 MIN_OUTPUT_AREA = 800_000
+# UnityPy keeps a lot alive per bundle; recycle workers so memory stays flat.
+BUNDLES_PER_WORKER = 8
 
 
 @dataclass
@@ -83,14 +90,14 @@ def _read_bundle(bundle: Path) -> tuple[dict[int, RectNode], dict[int, int], dic
     rect_by_game_object: dict[int, int] = {}
     images: dict[int, ImageNode] = {}
     sprites: dict[int, SpriteInfo] = {}
+    sprite_objects = []
 
+    # One pass over the objects; names and sprites are resolved once everything is seen.
     for obj in env.objects:
         if obj.type == ClassIDType.GameObject:
             data = obj.read_typetree()
             game_object_names[obj.path_id] = data.get("m_Name", "")
-
-    for obj in env.objects:
-        if obj.type == ClassIDType.RectTransform:
+        elif obj.type == ClassIDType.RectTransform:
             data = obj.read_typetree()
             game_object_id = _ptr_id(data.get("m_GameObject"))
             if game_object_id is None:
@@ -101,35 +108,35 @@ def _read_bundle(bundle: Path) -> tuple[dict[int, RectNode], dict[int, int], dic
             rects[obj.path_id] = RectNode(
                 path_id=obj.path_id,
                 game_object_id=game_object_id,
-                name=game_object_names.get(game_object_id, ""),
+                name="",
                 rect=data,
                 parent_id=parent_id,
                 child_ids=child_ids,
             )
             rect_by_game_object[game_object_id] = obj.path_id
+        elif obj.type == ClassIDType.MonoBehaviour:
+            try:
+                data = obj.read_typetree()
+            except Exception:
+                continue
+            sprite_id = _ptr_id(data.get("m_Sprite"))
+            game_object_id = _ptr_id(data.get("m_GameObject"))
+            if sprite_id is None or game_object_id is None:
+                continue
+            images[game_object_id] = ImageNode(
+                game_object_id=game_object_id,
+                sprite_id=sprite_id,
+                color=_color(data.get("m_Color")),
+            )
+        elif obj.type == ClassIDType.Sprite:
+            sprite_objects.append(obj)
 
-    for obj in env.objects:
-        if obj.type != ClassIDType.MonoBehaviour:
-            continue
-        try:
-            data = obj.read_typetree()
-        except Exception:
-            continue
-        sprite_id = _ptr_id(data.get("m_Sprite"))
-        game_object_id = _ptr_id(data.get("m_GameObject"))
-        if sprite_id is None or game_object_id is None:
-            continue
-        images[game_object_id] = ImageNode(
-            game_object_id=game_object_id,
-            sprite_id=sprite_id,
-            color=_color(data.get("m_Color")),
-        )
+    for node in rects.values():
+        node.name = game_object_names.get(node.game_object_id, "")
 
     wanted_sprite_ids = {image.sprite_id for image in images.values()}
     load_all_sprites = not wanted_sprite_ids
-    for obj in env.objects:
-        if obj.type != ClassIDType.Sprite:
-            continue
+    for obj in sprite_objects:
         if not load_all_sprites and obj.path_id not in wanted_sprite_ids:
             continue
         try:
@@ -259,26 +266,37 @@ def _child_layout(parent_layout: Layout, child: RectNode) -> Layout:
     )
 
 
-def _tint(image: Image.Image, color: tuple[float, float, float, float]) -> Image.Image:
-    r, g, b, a = color
-    if (r, g, b, a) == (1.0, 1.0, 1.0, 1.0):
-        return image
-    tinted = image.copy()
-    red, green, blue, alpha = tinted.split()
-    red = red.point(lambda value: round(value * r))
-    green = green.point(lambda value: round(value * g))
-    blue = blue.point(lambda value: round(value * b))
-    alpha = alpha.point(lambda value: round(value * a))
-    return Image.merge("RGBA", (red, green, blue, alpha))
+# Resized sprite pixels by (sprite id, width, height), shared by every root of a bundle.
+ResizeCache = dict[tuple[int, int, int], np.ndarray]
+
+
+def _resized(sprite_id: int, sprite: SpriteInfo, width: int, height: int, cache: ResizeCache) -> np.ndarray:
+    key = (sprite_id, width, height)
+    if key not in cache:
+        cache[key] = np.asarray(sprite.image.resize((width, height), Image.Resampling.LANCZOS))
+    return cache[key]
+
+
+def _tint(layer: np.ndarray, color: tuple[float, float, float, float]) -> np.ndarray:
+    if color == (1.0, 1.0, 1.0, 1.0):
+        return layer
+    # Rounds half to even like the per-channel `round` it replaces.
+    return np.clip(np.round(layer * np.array(color)), 0, 255).astype(np.uint8)
+
+
+def _overlaps(layout: Layout, width: int, height: int, canvas: np.ndarray) -> bool:
+    left, top = round(layout.left), round(layout.top)
+    return left < canvas.shape[1] and top < canvas.shape[0] and left + width > 0 and top + height > 0
 
 
 def _draw_node(
-    canvas: Image.Image,
+    canvas: np.ndarray,
     node_id: int,
     layout: Layout,
     rects: dict[int, RectNode],
     images: dict[int, ImageNode],
     sprites: dict[int, SpriteInfo],
+    cache: ResizeCache,
 ) -> None:
     node = rects[node_id]
     image_node = images.get(node.game_object_id)
@@ -287,15 +305,16 @@ def _draw_node(
         if sprite and layout.width > 1 and layout.height > 1:
             width = max(1, round(layout.width))
             height = max(1, round(layout.height))
-            image = sprite.image.resize((width, height), Image.Resampling.LANCZOS)
-            image = _tint(image, image_node.color)
-            _, max_alpha = image.split()[3].getextrema()
-            if max_alpha >= 200:
-                canvas.alpha_composite(image, (round(layout.left), round(layout.top)))
+            # Cheap rejections first: resizing is the expensive part.
+            if image_node.color[3] > 0 and _overlaps(layout, width, height, canvas):
+                layer = _resized(image_node.sprite_id, sprite, width, height, cache)
+                # Tinted alpha is round(alpha * a), so its maximum is known before tinting.
+                if round(int(layer[..., 3].max()) * image_node.color[3]) >= 200:
+                    alpha_composite(canvas, _tint(layer, image_node.color), round(layout.left), round(layout.top))
     for child_id in node.child_ids:
         if child_id not in rects:
             continue
-        _draw_node(canvas, child_id, _child_layout(layout, rects[child_id]), rects, images, sprites)
+        _draw_node(canvas, child_id, _child_layout(layout, rects[child_id]), rects, images, sprites, cache)
 
 
 def _export_root(
@@ -306,6 +325,7 @@ def _export_root(
     sprites: dict[int, SpriteInfo],
     output_dir: Path,
     overwrite: bool = False,
+    cache: ResizeCache | None = None,
 ) -> Path | None:
     path_name = _safe_name(_node_path(root_id, rects))
     output_path = output_dir / bundle.stem / f"{path_name}.png"
@@ -316,15 +336,15 @@ def _export_root(
     width, height = _root_size(root)
     if width * height < MIN_OUTPUT_AREA:
         return None
-    canvas = Image.new("RGBA", (round(width), round(height)), (0, 0, 0, 0))
+    canvas = np.zeros((round(height), round(width), 4), np.uint8)
     root_pivot_x, root_pivot_y = _vec2(root.rect.get("m_Pivot", {}), 0.5, 0.5)
     layout = Layout(0.0, 0.0, width, height, root_pivot_x, root_pivot_y)
-    _draw_node(canvas, root_id, layout, rects, images, sprites)
-    if not canvas.getbbox():
+    _draw_node(canvas, root_id, layout, rects, images, sprites, {} if cache is None else cache)
+    if not canvas[..., 3].any():
         return None
 
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    canvas.save(output_path)
+    image_index().write(Image.fromarray(canvas), output_path)
     return output_path
 
 
@@ -345,7 +365,7 @@ def _export_sprites_directly(
         output_path = output_dir / bundle.stem / f"{_safe_name(sprite.name)}.png"
         if not output_path.exists() or overwrite:
             output_path.parent.mkdir(parents=True, exist_ok=True)
-            sprite.image.save(output_path)
+            image_index().write(sprite.image, output_path)
         written.append(output_path)
     return written
 
@@ -386,15 +406,18 @@ def _match_sprites_to_layouts(
     root_layout: Layout,
     sprites: dict[int, SpriteInfo],
     candidate_ids: set[int] | None = None,
-) -> list[tuple[SpriteInfo, Layout]]:
-    """Walk the subtree (skipping root itself) and match bg_ sprites to image-bearing nodes."""
+) -> list[tuple[int, SpriteInfo, Layout]]:
+    """Walk the subtree (skipping root itself) and match bg_ sprites to image-bearing nodes.
+
+    Each match is (sprite path id, sprite, layout).
+    """
     candidates = [
         (sid, s) for sid, s in sprites.items()
         if s.name.startswith("bg_") and s.image.size[0] * s.image.size[1] >= MIN_SPRITE_AREA
         and (candidate_ids is None or sid in candidate_ids)
     ]
     used: set[int] = set()
-    result: list[tuple[SpriteInfo, Layout]] = []
+    result: list[tuple[int, SpriteInfo, Layout]] = []
 
     def visit(node_id: int, layout: Layout, is_root: bool) -> None:
         if node_id not in rects:
@@ -423,7 +446,7 @@ def _match_sprites_to_layouts(
                         best_score, best_sid = ratio_err, sid
             if best_sid is not None:
                 used.add(best_sid)
-                result.append((sprites[best_sid], layout))
+                result.append((best_sid, sprites[best_sid], layout))
         for child_id in node.child_ids:
             if child_id in rects:
                 visit(child_id, _child_layout(layout, rects[child_id]), False)
@@ -438,6 +461,7 @@ def _export_legacy_composites(
     sprites: dict[int, SpriteInfo],
     output_dir: Path,
     overwrite: bool = False,
+    cache: ResizeCache | None = None,
 ) -> tuple[list[Path], set[str]]:
     """
     For old bundles where Image components can't be read, reconstruct backgrounds
@@ -450,6 +474,8 @@ def _export_legacy_composites(
     RectTransform subtrees hanging off legacy bg-root nodes.
     """
     written: list[Path] = []
+    if cache is None:
+        cache = {}
     used_sprite_names: set[str] = set()
     used_sprite_ids: set[int] = set()
     seen_sprite_sets: set[frozenset[str]] = set()
@@ -467,22 +493,22 @@ def _export_legacy_composites(
         canvas_h = abs(sd.get("y", 0.0)) or ROOT_SIZE[1]
         return canvas_w, canvas_h
 
-    def _write_composite(layers: list[tuple[SpriteInfo, Layout]], canvas_w: float, canvas_h: float, output_path: Path) -> None:
+    def _write_composite(layers: list[tuple[int, SpriteInfo, Layout]], canvas_w: float, canvas_h: float, output_path: Path) -> None:
         if output_path.exists() and not overwrite:
             return
-        canvas = Image.new("RGBA", (round(canvas_w), round(canvas_h)), (0, 0, 0, 0))
-        for sprite, layout in layers:
+        canvas = np.zeros((round(canvas_h), round(canvas_w), 4), np.uint8)
+        for sprite_id, sprite, layout in layers:
             if layout.width < 1 or layout.height < 1:
                 continue
-            img = sprite.image.resize(
-                (max(1, round(layout.width)), max(1, round(layout.height))),
-                Image.Resampling.LANCZOS,
-            )
-            canvas.alpha_composite(img, (round(layout.left), round(layout.top)))
-        if not canvas.getbbox():
+            width, height = max(1, round(layout.width)), max(1, round(layout.height))
+            if not _overlaps(layout, width, height, canvas):
+                continue
+            layer = _resized(sprite_id, sprite, width, height, cache)
+            alpha_composite(canvas, layer, round(layout.left), round(layout.top))
+        if not canvas[..., 3].any():
             return
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        canvas.save(output_path)
+        image_index().write(Image.fromarray(canvas), output_path)
 
     # === Pass 1: naming-group composites ===
     # Group sprites by naming convention: bg_X is the base of bg_X_1, bg_X_2, …
@@ -491,7 +517,7 @@ def _export_legacy_composites(
         base_sprite = sprites[base_id]
 
         # Among all bg_roots, find the one whose subtree best matches the variants.
-        best_matches: list[tuple[SpriteInfo, Layout]] = []
+        best_matches: list[tuple[int, SpriteInfo, Layout]] = []
         best_canvas: tuple[float, float] = ROOT_SIZE
 
         for root_id in bg_root_ids:
@@ -514,9 +540,9 @@ def _export_legacy_composites(
 
         canvas_w, canvas_h = best_canvas
         base_layout = Layout(0.0, 0.0, canvas_w, canvas_h, 0.5, 0.5)
-        all_layers = [(base_sprite, base_layout)] + best_matches
+        all_layers = [(base_id, base_sprite, base_layout)] + best_matches
 
-        sprite_key = frozenset(s.name for s, _ in all_layers)
+        sprite_key = frozenset(s.name for _, s, _ in all_layers)
         if sprite_key in seen_sprite_sets:
             used_sprite_names.update(sprite_key)
             used_sprite_ids.add(base_id)
@@ -544,7 +570,7 @@ def _export_legacy_composites(
         if not matched:
             continue
 
-        sprite_key = frozenset(s.name for s, _ in matched)
+        sprite_key = frozenset(s.name for _, s, _ in matched)
         if sprite_key in seen_sprite_sets:
             used_sprite_names.update(sprite_key)
             continue
@@ -580,41 +606,67 @@ def _activity_bundles() -> list[Path]:
     return sorted(bundles, key=lambda path: path.name)
 
 
-def export_event_images(overwrite: bool = False) -> list[Path]:
+def _export_bundle(bundle: Path, output_dir: Path, overwrite: bool = False) -> tuple[list[Path], str]:
+    """Export one bundle's backgrounds; returns the images and a status line for the log."""
+    bundle_output_dir = output_dir / bundle.stem
+    marker_path = bundle_output_dir / ".processed"
+    if not overwrite and marker_path.exists():
+        return sorted(bundle_output_dir.glob("*.png")), "skipped (already processed, use --overwrite to regenerate)"
+    bundle_written: list[Path] = []
+    try:
+        rects, _, images, sprites = _read_bundle(bundle)
+        roots = _find_roots(rects, images, sprites)
+        cache: ResizeCache = {}
+        for root_id in roots:
+            output_path = _export_root(bundle, root_id, rects, images, sprites, output_dir,
+                                       overwrite=overwrite, cache=cache)
+            if output_path:
+                bundle_written.append(output_path)
+        if not bundle_written and not images:
+            composites, used_names = _export_legacy_composites(bundle, rects, sprites, output_dir,
+                                                                 overwrite=overwrite, cache=cache)
+            leftovers = _export_sprites_directly(bundle, sprites, output_dir, exclude=used_names, overwrite=overwrite)
+            bundle_written = composites + leftovers
+        bundle_output_dir.mkdir(parents=True, exist_ok=True)
+        marker_path.touch()
+    except Exception as e:
+        return bundle_written, f"WARNING: Failed to process {bundle.name}: {e}"
+    if bundle_written:
+        return bundle_written, f"wrote {len(bundle_written)} images"
+    return bundle_written, "no large backgrounds found"
+
+
+def _export_bundle_in_worker(bundle: Path, output_dir: Path, overwrite: bool) -> tuple[list[Path], str, dict[str, ImageInfo]]:
+    written, status = _export_bundle(bundle, output_dir, overwrite)
+    # The worker's image index dies with it, so hand its additions to the parent.
+    return written, status, image_index().drain()
+
+
+def _collect(bundles: list[Path], results: Iterable[tuple[list[Path], str, dict[str, ImageInfo]]]) -> list[Path]:
+    written: list[Path] = []
+    for index, (bundle, (bundle_written, status, indexed)) in enumerate(zip(bundles, results), start=1):
+        image_index().merge(indexed)
+        written.extend(bundle_written)
+        if status.startswith("WARNING"):
+            print(status)
+        else:
+            print(f"[{index}/{len(bundles)}] {bundle.name}: {status}")
+    return written
+
+
+def export_event_images(overwrite: bool = False, jobs: int | None = None) -> list[Path]:
     output_dir = Path("assets") / "event_bgs"
     output_dir.mkdir(parents=True, exist_ok=True)
-    written: list[Path] = []
     bundles = _activity_bundles()
     print(f"Processing {len(bundles)} ui_activity bundles...")
-    for index, bundle in enumerate(bundles, start=1):
-        bundle_output_dir = output_dir / bundle.stem
-        marker_path = bundle_output_dir / ".processed"
-        if not overwrite and marker_path.exists():
-            written.extend(sorted(bundle_output_dir.glob("*.png")))
-            print(f"[{index}/{len(bundles)}] {bundle.name}: skipped (already processed, use --overwrite to regenerate)")
-            continue
-        try:
-            rects, _, images, sprites = _read_bundle(bundle)
-            roots = _find_roots(rects, images, sprites)
-            bundle_written: list[Path] = []
-            for root_id in roots:
-                output_path = _export_root(bundle, root_id, rects, images, sprites, output_dir, overwrite=overwrite)
-                if output_path:
-                    bundle_written.append(output_path)
-                    written.append(output_path)
-            if not bundle_written and not images:
-                composites, used_names = _export_legacy_composites(bundle, rects, sprites, output_dir, overwrite=overwrite)
-                leftovers = _export_sprites_directly(bundle, sprites, output_dir, exclude=used_names, overwrite=overwrite)
-                bundle_written = composites + leftovers
-                written.extend(bundle_written)
-            if bundle_written:
-                print(f"[{index}/{len(bundles)}] {bundle.name}: wrote {len(bundle_written)} images")
-            else:
-                print(f"[{index}/{len(bundles)}] {bundle.name}: no large backgrounds found")
-            bundle_output_dir.mkdir(parents=True, exist_ok=True)
-            marker_path.touch()
-        except Exception as e:
-            print(f"WARNING: Failed to process {bundle.name}: {e}")
+    work = partial(_export_bundle_in_worker, output_dir=output_dir, overwrite=overwrite)
+    workers = min(jobs or max(os.cpu_count() - 4, 4), len(bundles))
+    if workers <= 1:
+        written = _collect(bundles, map(work, bundles))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=BUNDLES_PER_WORKER) as pool:
+            written = _collect(bundles, pool.map(work, bundles))
+    image_index().save()
     print(f"Wrote {len(written)} images to {output_dir}")
     return written
 
@@ -623,12 +675,13 @@ def _parse_args() -> Any:
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("--overwrite", action="store_true", help="Re-export even if output already exists")
+    parser.add_argument("--jobs", type=int, default=None, help="Bundles to export at once (default: cores - 4)")
     return parser.parse_args()
 
 
 def main() -> None:
     args = _parse_args()
-    export_event_images(overwrite=args.overwrite)
+    export_event_images(overwrite=args.overwrite, jobs=args.jobs)
 
 
 if __name__ == "__main__":
@@ -1,12 +1,16 @@
 import argparse
 import json
+import os
 import re
-from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from functools import partial
 from io import BytesIO
 from pathlib import Path
 from typing import Any
 
 import UnityPy
+import xxhash
 from UnityPy.enums import ClassIDType
 from UnityPy.files import ObjectReader
 
@@ -45,6 +49,10 @@ class Live2DExportResult:
     warnings: list[str] = field(default_factory=list)
     skipped: bool = False
     skip_reason: str | None = None
+    source_fingerprint: str | None = None
+    # Name, mtime_ns and size of each source bundle when `source_fingerprint` was taken.
+    source_stat: list[Any] = field(default_factory=list)
+    file_hashes: dict[str, str] = field(default_factory=dict)
 
 
 @dataclass
@@ -120,26 +128,107 @@ def _read_typetree(
         return None
 
 
-def _script_names(
-    objects: dict[int, ObjectReader],
-    source_bundle: Path,
-    read_errors: list[Live2DReadError],
-) -> dict[int, str]:
-    scripts: dict[int, str] = {}
-    for path_id, obj in objects.items():
-        if obj.type != ClassIDType.MonoScript:
-            continue
-        data = _read_typetree(obj, source_bundle, read_errors, "read MonoScript")
+class Live2DObjectGraph:
+    """A skin's objects, each typetree read at most once.
+
+    The variants of a skin walk overlapping prefab hierarchies and all scan the
+    same MonoBehaviours for motion lists, and typetree deserialisation is most of
+    the time a skin takes. An object that failed to read is not tried again, but
+    its error is recorded on every access so per-variant warnings still count it.
+
+    The hierarchy links (a Transform's GameObject and children, a GameObject's
+    components) are kept once extracted, so later variants walk plain dicts.
+    """
+
+    def __init__(
+        self,
+        objects: dict[int, ObjectReader],
+        source_bundle: Path,
+        read_errors: list[Live2DReadError],
+    ) -> None:
+        self.objects = objects
+        self.source_bundle = source_bundle
+        self.read_errors = read_errors
+        self._typetrees: dict[int, dict[str, Any] | None] = {}
+        self._failures: dict[int, Live2DReadError] = {}
+        self._names: dict[int, str] = {}
+        self._scripts: dict[int, str] | None = None
+        self._transform_links: dict[int, tuple[int | None, list[int]]] = {}
+        self._component_ids: dict[int, list[int]] = {}
+
+    def get(self, path_id: int | None) -> ObjectReader | None:
+        return self.objects.get(path_id)
+
+    def is_type(self, path_id: int | None, object_type: ClassIDType) -> bool:
+        obj = self.objects.get(path_id)
+        return obj is not None and obj.type == object_type
+
+    def typetree(self, obj: ObjectReader, context: str) -> dict[str, Any] | None:
+        path_id = obj.path_id
+        if path_id in self._typetrees:
+            data = self._typetrees[path_id]
+            if data is None:
+                self.read_errors.append(replace(self._failures[path_id], context=context))
+            return data
+        data = _read_typetree(obj, self.source_bundle, self.read_errors, context)
         if data is None:
-            continue
-        name = data.get("m_Name") or data.get("m_ClassName")
-        if name:
-            scripts[path_id] = name
-    return scripts
-
-
-def _script_name(data: dict[str, Any], scripts: dict[int, str]) -> str | None:
-    return scripts.get(_path_id(data.get("m_Script")))
+            self._failures[path_id] = self.read_errors[-1]
+        self._typetrees[path_id] = data
+        return data
+
+    def transform_links(self, transform_id: int, context: str) -> tuple[int | None, list[int]] | None:
+        """The GameObject a Transform belongs to and its child Transforms, or None if unreadable."""
+        if transform_id in self._transform_links:
+            return self._transform_links[transform_id]
+        transform_obj = self.get(transform_id)
+        if transform_obj is None:
+            return None
+        # Unreadable objects are not remembered here, so typetree() records their error again.
+        transform = self.typetree(transform_obj, context)
+        if transform is None:
+            return None
+        child_ids = [_path_id(child) for child in transform.get("m_Children") or []]
+        links = (_path_id(transform.get("m_GameObject")), [c for c in child_ids if c is not None])
+        self._transform_links[transform_id] = links
+        return links
+
+    def component_ids(self, game_object_id: int, context: str) -> list[int] | None:
+        """A GameObject's components in order, or None if unreadable."""
+        if game_object_id in self._component_ids:
+            return self._component_ids[game_object_id]
+        game_object = self.get(game_object_id)
+        if game_object is None:
+            return None
+        game_object_data = self.typetree(game_object, context)
+        if game_object_data is None:
+            return None
+        component_ids = [_component_path_id(c) for c in game_object_data.get("m_Component") or []]
+        self._component_ids[game_object_id] = [c for c in component_ids if c is not None]
+        return self._component_ids[game_object_id]
+
+    def name(self, path_id: int) -> str:
+        if path_id not in self._names:
+            obj = self.objects[path_id]
+            self._names[path_id] = obj.peek_name() or obj.read().m_Name
+        return self._names[path_id]
+
+    @property
+    def scripts(self) -> dict[int, str]:
+        if self._scripts is None:
+            self._scripts = {}
+            for path_id, obj in self.objects.items():
+                if obj.type != ClassIDType.MonoScript:
+                    continue
+                data = self.typetree(obj, "read MonoScript")
+                if data is None:
+                    continue
+                name = data.get("m_Name") or data.get("m_ClassName")
+                if name:
+                    self._scripts[path_id] = name
+        return self._scripts
+
+    def script_name(self, data: dict[str, Any]) -> str | None:
+        return self.scripts.get(_path_id(data.get("m_Script")))
 
 
 def _safe_json_name(name: str) -> str:
@@ -175,11 +264,72 @@ def _write_json(path: Path, data: dict[str, Any]) -> None:
     print(f"Written to {path}")
 
 
-def _export_texture(obj: ObjectReader, path: Path) -> None:
+def _content_hash(data: bytes) -> str:
+    return xxhash.xxh3_64_hexdigest(data)
+
+
+def _source_stat(source_bundle: Path, l2d_bundle: Path | None) -> list[Any]:
+    stat: list[Any] = []
+    for bundle in (source_bundle, l2d_bundle):
+        if bundle is None:
+            stat.append(None)
+            continue
+        bundle_stat = bundle.stat()
+        stat.append([bundle.name, bundle_stat.st_mtime_ns, bundle_stat.st_size])
+    return stat
+
+
+def _source_fingerprint(source_bundle: Path, l2d_bundle: Path | None) -> str:
+    """Hash of the bundles a skin is exported from; any change to either re-exports it."""
+    digest = xxhash.xxh3_64()
+    for bundle in (source_bundle, l2d_bundle):
+        if bundle is None:
+            digest.update(b"\0")
+            continue
+        digest.update(bundle.name.encode())
+        with open(bundle, "rb") as f:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass
+class Live2DOutputFiles:
+    """Writes a variant's files, recording each one's hash for the manifest.
+
+    A file whose hash matches the previous manifest and that is still on disk is
+    left alone without being read back.
+    """
+    out_dir: Path
+    previous: dict[str, str]
+    hashes: dict[str, str] = field(default_factory=dict)
+
+    def write_bytes(self, relative: str, data: bytes) -> None:
+        digest = _content_hash(data)
+        self.hashes[relative] = digest
+        path = self.out_dir / relative
+        if self.previous.get(relative) == digest and path.exists():
+            return
+        _write_bytes(path, data)
+
+    def write_json(self, relative: str, data: dict[str, Any]) -> None:
+        text = json.dumps(data, indent=4, ensure_ascii=False) + "\n"
+        self.write_bytes(relative, text.encode("utf-8"))
+
+    def remove_stale(self) -> None:
+        """Delete files the previous manifest listed that this export did not write."""
+        for relative in sorted(self.previous.keys() - self.hashes.keys()):
+            path = self.out_dir / relative
+            if path.exists():
+                path.unlink()
+                print(f"Removed stale {path}")
+
+
+def _export_texture(obj: ObjectReader, files: Live2DOutputFiles, relative: str) -> None:
     data = obj.read()
     buffer = BytesIO()
     data.image.save(buffer, format="png")
-    _write_bytes(path, buffer.getvalue())
+    files.write_bytes(relative, buffer.getvalue())
 
 
 def _bundle_by_skin_id() -> dict[int, Path]:
@@ -213,22 +363,7 @@ def _prefab_roots(objects: dict[int, ObjectReader], skin_id: int) -> dict[str, O
     return roots
 
 
-def _descendant_game_objects(
-    root: ObjectReader,
-    objects: dict[int, ObjectReader],
-    source_bundle: Path,
-    read_errors: list[Live2DReadError],
-) -> list[int]:
-    root_data = _read_typetree(root, source_bundle, read_errors, "read prefab root")
-    if root_data is None:
-        return []
-    components = root_data.get("m_Component") or []
-    if not components:
-        return []
-    root_transform_id = _component_path_id(components[0])
-    if root_transform_id is None:
-        return []
-
+def _walk_transforms(graph: Live2DObjectGraph, root_transform_id: int, context: str) -> list[int]:
     result: list[int] = []
     seen_transforms: set[int] = set()
     stack = [root_transform_id]
@@ -237,107 +372,54 @@ def _descendant_game_objects(
         if transform_id in seen_transforms:
             continue
         seen_transforms.add(transform_id)
-        transform_obj = objects.get(transform_id)
-        if transform_obj is None:
+        links = graph.transform_links(transform_id, context)
+        if links is None:
             continue
-        transform = _read_typetree(transform_obj, source_bundle, read_errors, "read transform hierarchy")
-        if transform is None:
-            continue
-        game_object_id = _path_id(transform.get("m_GameObject"))
+        game_object_id, child_ids = links
         if game_object_id is not None:
             result.append(game_object_id)
-        for child in transform.get("m_Children") or []:
-            child_id = _path_id(child)
-            if child_id is not None:
-                stack.append(child_id)
+        stack.extend(child_ids)
     return result
 
 
-def _transform_for_game_object(
-    game_object_id: int,
-    objects: dict[int, ObjectReader],
-    source_bundle: Path,
-    read_errors: list[Live2DReadError],
-    context: str,
-) -> int | None:
-    game_object = objects.get(game_object_id)
-    if game_object is None:
-        return None
-    game_object_data = _read_typetree(game_object, source_bundle, read_errors, context)
-    if game_object_data is None:
-        return None
-    for component in game_object_data.get("m_Component") or []:
-        component_id = _component_path_id(component)
-        component_obj = objects.get(component_id)
-        if component_id is not None and component_obj is not None and component_obj.type == ClassIDType.Transform:
+def _descendant_game_objects(root: ObjectReader, graph: Live2DObjectGraph) -> list[int]:
+    component_ids = graph.component_ids(root.path_id, "read prefab root")
+    if not component_ids:
+        return []
+    return _walk_transforms(graph, component_ids[0], "read transform hierarchy")
+
+
+def _transform_for_game_object(game_object_id: int, graph: Live2DObjectGraph, context: str) -> int | None:
+    for component_id in graph.component_ids(game_object_id, context) or []:
+        if graph.is_type(component_id, ClassIDType.Transform):
             return component_id
     return None
 
 
-def _descendant_game_objects_from_id(
-    root_game_object_id: int,
-    objects: dict[int, ObjectReader],
-    source_bundle: Path,
-    read_errors: list[Live2DReadError],
-) -> list[int]:
+def _descendant_game_objects_from_id(root_game_object_id: int, graph: Live2DObjectGraph) -> list[int]:
     root_transform_id = _transform_for_game_object(
         root_game_object_id,
-        objects,
-        source_bundle,
-        read_errors,
+        graph,
         "read CubismModel GameObject transform",
     )
     if root_transform_id is None:
         return []
-
-    result: list[int] = []
-    seen_transforms: set[int] = set()
-    stack = [root_transform_id]
-    while stack:
-        transform_id = stack.pop()
-        if transform_id in seen_transforms:
-            continue
-        seen_transforms.add(transform_id)
-        transform_obj = objects.get(transform_id)
-        if transform_obj is None:
-            continue
-        transform = _read_typetree(transform_obj, source_bundle, read_errors, "read CubismModel transform hierarchy")
-        if transform is None:
-            continue
-        game_object_id = _path_id(transform.get("m_GameObject"))
-        if game_object_id is not None:
-            result.append(game_object_id)
-        for child in transform.get("m_Children") or []:
-            child_id = _path_id(child)
-            if child_id is not None:
-                stack.append(child_id)
-    return result
+    return _walk_transforms(graph, root_transform_id, "read CubismModel transform hierarchy")
 
 
 def _components_for_game_objects(
     game_object_ids: list[int],
-    objects: dict[int, ObjectReader],
-    scripts: dict[int, str],
-    source_bundle: Path,
-    read_errors: list[Live2DReadError],
+    graph: Live2DObjectGraph,
 ) -> list[tuple[int, str | None, dict[str, Any]]]:
     components: list[tuple[int, str | None, dict[str, Any]]] = []
     for game_object_id in game_object_ids:
-        game_object = objects.get(game_object_id)
-        if game_object is None:
-            continue
-        game_object_data = _read_typetree(game_object, source_bundle, read_errors, "read GameObject components")
-        if game_object_data is None:
-            continue
-        for component in game_object_data.get("m_Component") or []:
-            component_id = _component_path_id(component)
-            component_obj = objects.get(component_id)
-            if component_id is None or component_obj is None or component_obj.type != ClassIDType.MonoBehaviour:
+        for component_id in graph.component_ids(game_object_id, "read GameObject components") or []:
+            if not graph.is_type(component_id, ClassIDType.MonoBehaviour):
                 continue
-            data = _read_typetree(component_obj, source_bundle, read_errors, "read MonoBehaviour component")
+            data = graph.typetree(graph.get(component_id), "read MonoBehaviour component")
             if data is None:
                 continue
-            components.append((component_id, _script_name(data, scripts), data))
+            components.append((component_id, graph.script_name(data), data))
     return components
 
 
@@ -364,18 +446,17 @@ def _texture_sort_key(item: tuple[int, str]) -> tuple[str, int, str]:
 
 def _collect_textures(
     components: list[tuple[int, str | None, dict[str, Any]]],
-    objects: dict[int, ObjectReader],
+    graph: Live2DObjectGraph,
 ) -> list[tuple[int, ObjectReader]]:
     texture_ids: dict[int, str] = {}
     for _, script, data in components:
         if script != "CubismRenderer":
             continue
         texture_id = _path_id(data.get("_mainTexture"))
-        texture_obj = objects.get(texture_id)
-        if texture_id is None or texture_obj is None or texture_obj.type != ClassIDType.Texture2D:
+        if texture_id is None or not graph.is_type(texture_id, ClassIDType.Texture2D):
             continue
-        texture_ids[texture_id] = texture_obj.read().m_Name
-    return [(path_id, objects[path_id]) for path_id, _ in sorted(texture_ids.items(), key=_texture_sort_key)]
+        texture_ids[texture_id] = graph.name(texture_id)
+    return [(path_id, graph.objects[path_id]) for path_id, _ in sorted(texture_ids.items(), key=_texture_sort_key)]
 
 
 def _moc_base_name(skin_id: int, variant: Live2DVariant) -> str:
@@ -404,9 +485,7 @@ def _model_candidates(
     skin_id: int,
     variant: Live2DVariant,
     components: list[tuple[int, str | None, dict[str, Any]]],
-    objects: dict[int, ObjectReader],
-    source_bundle: Path,
-    read_errors: list[Live2DReadError],
+    graph: Live2DObjectGraph,
     result: Live2DExportResult,
 ) -> list[Live2DModelCandidate]:
     candidates: list[Live2DModelCandidate] = []
@@ -419,11 +498,11 @@ def _model_candidates(
             result.warnings.append(f"CubismModel component {component_id} has no GameObject.")
             continue
         moc_id = _path_id(data.get("_moc"))
-        moc_obj = objects.get(moc_id)
+        moc_obj = graph.get(moc_id)
         if moc_id is None or moc_obj is None:
             result.warnings.append(f"CubismModel component {component_id} has no readable CubismMoc reference.")
             continue
-        moc_data = _read_typetree(moc_obj, source_bundle, read_errors, "read CubismMoc")
+        moc_data = graph.typetree(moc_obj, "read CubismMoc")
         if moc_data is None:
             result.warnings.append(f"CubismMoc reference for component {component_id} could not be read.")
             continue
@@ -432,12 +511,12 @@ def _model_candidates(
         if not moc_bytes.startswith(b"MOC3"):
             result.warnings.append(f"CubismMoc {moc_name} bytes do not start with MOC3.")
             continue
-        descendant_ids = _descendant_game_objects_from_id(game_object_id, objects, source_bundle, read_errors)
+        descendant_ids = _descendant_game_objects_from_id(game_object_id, graph)
         if not descendant_ids:
             result.warnings.append(f"CubismModel {moc_name} has no readable descendant hierarchy.")
             continue
         scoped_components = _candidate_components(descendant_ids, components_by_game_object)
-        texture_objects = _collect_textures(scoped_components, objects)
+        texture_objects = _collect_textures(scoped_components, graph)
         if not texture_objects:
             result.warnings.append(f"CubismModel {moc_name} has no readable textures.")
             continue
@@ -486,22 +565,19 @@ def _motion_list_names(variant: Live2DVariant, moc_name: str, skin_id: int) -> l
 
 
 def _find_motion_list(
-    objects: dict[int, ObjectReader],
-    scripts: dict[int, str],
+    graph: Live2DObjectGraph,
     motion_list_names: list[str],
-    source_bundle: Path,
-    read_errors: list[Live2DReadError],
 ) -> tuple[str, dict[str, Any]] | None:
     requested_names = set(motion_list_names)
     matches: dict[str, dict[str, Any]] = {}
-    for obj in objects.values():
+    for obj in graph.objects.values():
         if obj.type != ClassIDType.MonoBehaviour:
             continue
-        data = _read_typetree(obj, source_bundle, read_errors, "read motion list candidate")
+        data = graph.typetree(obj, "read motion list candidate")
         if data is None:
             continue
         name = data.get("m_Name")
-        if _script_name(data, scripts) == "CubismFadeMotionList" and name in requested_names:
+        if graph.script_name(data) == "CubismFadeMotionList" and name in requested_names:
             matches.setdefault(name, data)
     for name in motion_list_names:
         if name in matches:
@@ -597,23 +673,21 @@ def _motion_file_name(data: dict[str, Any]) -> str:
 
 def _export_motion_data(
     motion_list: dict[str, Any],
-    objects: dict[int, ObjectReader],
-    out_dir: Path,
-    source_bundle: Path,
-    read_errors: list[Live2DReadError],
+    graph: Live2DObjectGraph,
+    files: Live2DOutputFiles,
 ) -> list[Live2DMotion]:
     motions: list[Live2DMotion] = []
     for motion_ref in motion_list.get("CubismFadeMotionObjects") or []:
         motion_id = _path_id(motion_ref)
-        motion_obj = objects.get(motion_id)
+        motion_obj = graph.get(motion_id)
         if motion_id is None or motion_obj is None:
             continue
-        data = _read_typetree(motion_obj, source_bundle, read_errors, "read fade motion data")
+        data = graph.typetree(motion_obj, "read fade motion data")
         if data is None:
             continue
         file_name = _motion_file_name(data)
         motion_json = _motion_json(data)
-        _write_json(out_dir / "motions" / file_name, motion_json)
+        files.write_json(f"motions/{file_name}", motion_json)
         name = file_name.removesuffix(".motion3.json")
         motions.append(Live2DMotion(
             name=name,
@@ -659,14 +733,33 @@ def _remove_stale_model_json(out_dir: Path, skin_id: int, variant: Live2DVariant
         print(f"Removed stale skipped model {model_path}")
 
 
-def _load_existing_result(skin_id: int, variant: Live2DVariant, out_dir: Path) -> Live2DExportResult | None:
+def _read_manifest(out_dir: Path) -> dict[str, Any] | None:
     manifest_path = out_dir / "stella_live2d_manifest.json"
     if not manifest_path.exists():
         return None
     try:
-        data = json.loads(manifest_path.read_text(encoding="utf-8"))
+        return json.loads(manifest_path.read_text(encoding="utf-8"))
     except (OSError, json.JSONDecodeError):
         return None
+
+
+def _load_existing_result(
+    skin_id: int,
+    variant: Live2DVariant,
+    out_dir: Path,
+    source_fingerprint: str,
+    source_stat: list[Any],
+) -> Live2DExportResult | None:
+    data = _read_manifest(out_dir)
+    if data is None or data.get("source_fingerprint") != source_fingerprint:
+        return None
+    file_hashes = data.get("files") or {}
+    if any(not (out_dir / relative).exists() for relative in file_hashes):
+        return None
+    if data.get("source_stat") != source_stat:
+        # Same contents under a new mtime; record it so the next run need not rehash.
+        data["source_stat"] = source_stat
+        _write_json(out_dir / "stella_live2d_manifest.json", data)
     result = Live2DExportResult(skin_id, variant.name, out_dir)
     result.moc_name = (data.get("moc") or {}).get("name")
     result.moc_file = (data.get("moc") or {}).get("file")
@@ -685,9 +778,26 @@ def _load_existing_result(skin_id: int, variant: Live2DVariant, out_dir: Path) -
     result.warnings = data.get("warnings") or []
     result.skipped = bool(data.get("skipped"))
     result.skip_reason = data.get("skip_reason")
+    result.source_fingerprint = source_fingerprint
+    result.source_stat = source_stat
+    result.file_hashes = file_hashes
     return result
 
 
+def _recorded_source_fingerprint(
+    output_root: Path,
+    skin_id: int,
+    variant_names: list[str],
+    source_stat: list[Any],
+) -> str | None:
+    """The fingerprint a variant's manifest took of these same bundle files, if any."""
+    for variant_name in variant_names:
+        data = _read_manifest(output_root / str(skin_id) / "live2d" / variant_name)
+        if data is not None and data.get("source_stat") == source_stat and data.get("source_fingerprint"):
+            return data["source_fingerprint"]
+    return None
+
+
 def _manifest(result: Live2DExportResult, source_bundle: Path, prefab_container: str) -> dict[str, Any]:
     return {
         "skin_id": result.skin_id,
@@ -695,6 +805,8 @@ def _manifest(result: Live2DExportResult, source_bundle: Path, prefab_container:
         "skipped": result.skipped,
         "skip_reason": result.skip_reason,
         "source_bundle": str(source_bundle),
+        "source_fingerprint": result.source_fingerprint,
+        "source_stat": result.source_stat,
         "prefab": prefab_container,
         "moc": {
             "name": result.moc_name,
@@ -713,11 +825,13 @@ def _manifest(result: Live2DExportResult, source_bundle: Path, prefab_container:
             for motion in result.motions
         ],
         "warnings": result.warnings,
+        "files": result.file_hashes,
     }
 
 
 def _skip_variant(
     result: Live2DExportResult,
+    files: Live2DOutputFiles,
     variant: Live2DVariant,
     source_bundle: Path,
     prefab_container: str,
@@ -727,6 +841,7 @@ def _skip_variant(
     result.skip_reason = reason
     result.warnings.append(reason)
     _remove_stale_model_json(result.output_dir, result.skin_id, variant)
+    files.remove_stale()
     _write_json(result.output_dir / "stella_live2d_manifest.json", _manifest(result, source_bundle, prefab_container))
     return result
 
@@ -734,30 +849,35 @@ def _skip_variant(
 def _export_variant(
     skin_id: int,
     variant: Live2DVariant,
-    source_bundle: Path,
-    objects: dict[int, ObjectReader],
-    scripts: dict[int, str],
+    graph: Live2DObjectGraph,
     prefab_root: ObjectReader,
     output_root: Path,
-    read_errors: list[Live2DReadError],
     overwrite: bool,
+    source_fingerprint: str,
+    source_stat: list[Any],
 ) -> Live2DExportResult:
     out_dir = output_root / str(skin_id) / "live2d" / variant.name
     if not overwrite:
-        existing = _load_existing_result(skin_id, variant, out_dir)
+        existing = _load_existing_result(skin_id, variant, out_dir, source_fingerprint, source_stat)
         if existing is not None:
             print(f"Skipping {skin_id} {variant.name}: already exported (use --overwrite to regenerate).")
             return existing
-    result = Live2DExportResult(skin_id, variant.name, out_dir)
+    result = Live2DExportResult(skin_id, variant.name, out_dir, source_fingerprint=source_fingerprint,
+                                source_stat=source_stat)
+    files = Live2DOutputFiles(out_dir, (_read_manifest(out_dir) or {}).get("files") or {})
+    result.file_hashes = files.hashes
+    source_bundle = graph.source_bundle
+    read_errors = graph.read_errors
     error_count = len(read_errors)
-    game_object_ids = _descendant_game_objects(prefab_root, objects, source_bundle, read_errors)
-    components = _components_for_game_objects(game_object_ids, objects, scripts, source_bundle, read_errors)
+    game_object_ids = _descendant_game_objects(prefab_root, graph)
+    components = _components_for_game_objects(game_object_ids, graph)
     if len(read_errors) > error_count:
         result.warnings.append(f"Skipped {len(read_errors) - error_count} unreadable prefab objects.")
-    candidates = _model_candidates(skin_id, variant, components, objects, source_bundle, read_errors, result)
+    candidates = _model_candidates(skin_id, variant, components, graph, result)
     if not candidates:
         return _skip_variant(
             result,
+            files,
             variant,
             source_bundle,
             prefab_root.container or "",
@@ -767,6 +887,7 @@ def _export_variant(
     if candidate is None:
         return _skip_variant(
             result,
+            files,
             variant,
             source_bundle,
             prefab_root.container or "",
@@ -780,20 +901,20 @@ def _export_variant(
 
     result.moc_name = candidate.moc_name
     result.moc_file = f"{_safe_json_name(candidate.moc_name)}.moc3"
-    _write_bytes(out_dir / result.moc_file, candidate.moc_bytes)
+    files.write_bytes(result.moc_file, candidate.moc_bytes)
 
-    for index, (_, texture_obj) in enumerate(candidate.texture_objects):
-        texture_name = texture_obj.read().m_Name
+    for index, (texture_id, texture_obj) in enumerate(candidate.texture_objects):
+        texture_name = graph.name(texture_id)
         file_name = f"{_safe_json_name(texture_name)}.png"
         texture_file = f"textures/{file_name}"
         result.texture_files.append(texture_file)
-        _export_texture(texture_obj, out_dir / texture_file)
+        _export_texture(texture_obj, files, texture_file)
         if index > 0 and result.texture_files[index] == result.texture_files[index - 1]:
             result.warnings.append(f"Duplicate texture filename generated for {texture_name}.")
 
     error_count = len(read_errors)
     requested_motion_lists = _motion_list_names(variant, candidate.moc_name, skin_id)
-    motion_list = _find_motion_list(objects, scripts, requested_motion_lists, source_bundle, read_errors)
+    motion_list = _find_motion_list(graph, requested_motion_lists)
     if len(read_errors) > error_count:
         result.warnings.append(f"Skipped {len(read_errors) - error_count} unreadable motion list candidates.")
     if motion_list is None:
@@ -803,25 +924,91 @@ def _export_variant(
         if motion_list_name != variant.motion_list_name:
             result.warnings.append(f"Using {motion_list_name} for {candidate.moc_name}.")
         error_count = len(read_errors)
-        result.motions = _export_motion_data(motion_list_data, objects, out_dir, source_bundle, read_errors)
+        result.motions = _export_motion_data(motion_list_data, graph, files)
         if len(read_errors) > error_count:
             result.warnings.append(f"Skipped {len(read_errors) - error_count} unreadable motion objects.")
 
-    _write_json(out_dir / _model_file_name(skin_id, variant), _model_json(
+    files.write_json(_model_file_name(skin_id, variant), _model_json(
         result.moc_file,
         result.texture_files,
         variant,
         result.motions,
     ))
+    files.remove_stale()
     _write_json(out_dir / "stella_live2d_manifest.json", _manifest(result, source_bundle, prefab_root.container or ""))
     return result
 
 
+def _export_skin(
+    skin_id: int,
+    source_bundle: Path,
+    l2d_bundle: Path | None,
+    selected_variants: set[str],
+    output_root: Path,
+    overwrite: bool,
+) -> tuple[list[Live2DExportResult], list[Live2DReadError]]:
+    results: list[Live2DExportResult] = []
+    read_errors: list[Live2DReadError] = []
+    # Only rehash the bundles when their size or mtime differs from what a manifest recorded.
+    source_stat = _source_stat(source_bundle, l2d_bundle)
+    source_fingerprint = (
+        _recorded_source_fingerprint(output_root, skin_id, sorted(selected_variants), source_stat)
+        or _source_fingerprint(source_bundle, l2d_bundle)
+    )
+    if not overwrite:
+        existing_results = [
+            _load_existing_result(
+                skin_id,
+                VARIANTS[variant_name],
+                output_root / str(skin_id) / "live2d" / variant_name,
+                source_fingerprint,
+                source_stat,
+            )
+            for variant_name in sorted(selected_variants)
+        ]
+        if all(existing is not None for existing in existing_results):
+            print(f"Skipping {source_bundle.name}: unchanged since last export (use --overwrite to regenerate).")
+            return existing_results, read_errors
+
+    print(f"Processing {source_bundle.name}")
+    env = UnityPy.load(str(source_bundle))
+    objects = {obj.path_id: obj for obj in env.objects}
+    if l2d_bundle is None:
+        print(f"WARNING: No char_l2d bundle found for skin {skin_id}")
+    else:
+        l2d_env = UnityPy.load(str(l2d_bundle))
+        objects.update({obj.path_id: obj for obj in l2d_env.objects})
+    graph = Live2DObjectGraph(objects, source_bundle, read_errors)
+    prefabs = _prefab_roots(objects, skin_id)
+    for variant_name in sorted(selected_variants):
+        prefab_root = prefabs.get(variant_name)
+        if prefab_root is None:
+            print(f"WARNING: No {variant_name} prefab found for skin {skin_id}")
+            continue
+        results.append(_export_variant(
+            skin_id,
+            VARIANTS[variant_name],
+            graph,
+            prefab_root,
+            output_root,
+            overwrite,
+            source_fingerprint,
+            source_stat,
+        ))
+    return results, read_errors
+
+
+# Skins a worker exports before it is replaced. UnityPy keeps hold of much of what
+# a bundle decoded, so a long-lived worker only grows.
+SKINS_PER_WORKER = 8
+
+
 def export_live2d(
     skin_ids: set[int] | None = None,
     variants: set[str] | None = None,
     output_root: Path | None = None,
     overwrite: bool = False,
+    jobs: int | None = None,
 ) -> list[Live2DExportResult]:
     selected_variants = variants or DEFAULT_VARIANTS
     unknown_variants = selected_variants - set(VARIANTS)
@@ -837,46 +1024,22 @@ def export_live2d(
             print(f"WARNING: No char_2d bundle found for skin {skin_id}")
         bundles = {skin_id: bundles[skin_id] for skin_id in sorted(skin_ids & set(bundles))}
 
+    skin_order = sorted(bundles)
+    sources = [bundles[skin_id] for skin_id in skin_order]
+    l2d_sources = [l2d_bundles.get(skin_id) for skin_id in skin_order]
+    work = partial(_export_skin, selected_variants=selected_variants, output_root=output_root, overwrite=overwrite)
+    workers = min(jobs or max(os.cpu_count() - 4, 4), len(skin_order))
+    if workers <= 1:
+        per_skin = list(map(work, skin_order, sources, l2d_sources))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=SKINS_PER_WORKER) as pool:
+            per_skin = list(pool.map(work, skin_order, sources, l2d_sources))
     results: list[Live2DExportResult] = []
     read_errors: list[Live2DReadError] = []
-    for skin_id, source_bundle in sorted(bundles.items()):
-        if not overwrite:
-            existing_results = [
-                _load_existing_result(skin_id, VARIANTS[variant_name], output_root / str(skin_id) / "live2d" / variant_name)
-                for variant_name in sorted(selected_variants)
-            ]
-            if all(existing is not None for existing in existing_results):
-                print(f"Skipping {source_bundle.name}: all variants already exported (use --overwrite to regenerate).")
-                results.extend(existing_results)
-                continue
-
-        print(f"Processing {source_bundle.name}")
-        env = UnityPy.load(str(source_bundle))
-        objects = {obj.path_id: obj for obj in env.objects}
-        l2d_bundle = l2d_bundles.get(skin_id)
-        if l2d_bundle is None:
-            print(f"WARNING: No char_l2d bundle found for skin {skin_id}")
-        else:
-            l2d_env = UnityPy.load(str(l2d_bundle))
-            objects.update({obj.path_id: obj for obj in l2d_env.objects})
-        scripts = _script_names(objects, source_bundle, read_errors)
-        prefabs = _prefab_roots(objects, skin_id)
-        for variant_name in sorted(selected_variants):
-            prefab_root = prefabs.get(variant_name)
-            if prefab_root is None:
-                print(f"WARNING: No {variant_name} prefab found for skin {skin_id}")
-                continue
-            results.append(_export_variant(
-                skin_id,
-                VARIANTS[variant_name],
-                source_bundle,
-                objects,
-                scripts,
-                prefab_root,
-                output_root,
-                read_errors,
-                overwrite,
-            ))
+    # map() keeps the skins in order, so the merged lists match a serial run.
+    for skin_results, skin_errors in per_skin:
+        results.extend(skin_results)
+        read_errors.extend(skin_errors)
     if read_errors:
         formatted_errors = _unique_read_error_formats(read_errors)
         print(f"Skipped {len(formatted_errors)} unreadable Unity objects:")
@@ -891,6 +1054,7 @@ def _parse_args() -> argparse.Namespace:
     parser.add_argument("--variant", choices=sorted(VARIANTS), action="append", dest="variants")
     parser.add_argument("--out", type=Path, default=None)
     parser.add_argument("--overwrite", action="store_true", help="Re-export even if output already exists")
+    parser.add_argument("--jobs", type=int, default=None, help="Skins to export at once (default: cores - 4)")
     return parser.parse_args()
 
 
@@ -898,7 +1062,13 @@ def main() -> None:
     args = _parse_args()
     skin_ids = set(args.skin_ids) if args.skin_ids else None
     variants = set(args.variants) if args.variants else None
-    results = export_live2d(skin_ids=skin_ids, variants=variants, output_root=args.out, overwrite=args.overwrite)
+    results = export_live2d(
+        skin_ids=skin_ids,
+        variants=variants,
+        output_root=args.out,
+        overwrite=args.overwrite,
+        jobs=args.jobs,
+    )
     exported = sum(1 for result in results if result.moc_file)
     print(f"Exported {exported} Live2D variants.")
 
@@ -7,6 +7,7 @@ material `extras` for `tools/model_viewer.html`.
 
     uv run -m unpack.unpack_model                 # everything
     uv run -m unpack.unpack_model --char-id 13301 # one character
+    uv run -m unpack.unpack_model --char-id 13301 --clip-jobs 8 --overwrite
 """
 import argparse
 import io
@@ -18,7 +19,7 @@ import zlib
 from concurrent.futures import ProcessPoolExecutor
 from functools import cache, partial
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Iterator, Optional
 
 import numpy as np
 import UnityPy
@@ -31,7 +32,7 @@ from unpack.unpack_utils import get_unity3d_files
 from utils.data_utils import assets_root
 
 model_root = assets_root / "actor3d"
-CAB_INDEX_PATH = assets_root / "cab_index.json"
+CAB_INDEX_PATH = assets_root / "cab_index.bin"
 
 # Unity is left handed (+X right, +Z forward); glTF is right handed (-X right,
 # +Z forward). Mirroring X converts between them while preserving model facing.
@@ -74,28 +75,96 @@ def _bundle_cabs(path: str) -> tuple[str, list[str]]:
         return path, []
 
 
+# A bundle's entry is (mtime_ns, size, its CABs); it is rescanned when either changes.
+CabEntry = tuple[int, int, list[str]]
+CAB_INDEX_MAGIC = b"CABI\x01"
+
+
+def _read_cab_entries(path: Path) -> dict[str, CabEntry]:
+    """Load the index file, or nothing if it is missing or from another format.
+
+    Layout, zlib-compressed: per bundle, a length-prefixed UTF-8 path, mtime_ns
+    and size as int64, a CAB count, then each CAB length-prefixed.
+    """
+    try:
+        raw = path.read_bytes()
+        if not raw.startswith(CAB_INDEX_MAGIC):
+            return {}
+        data = zlib.decompress(raw[len(CAB_INDEX_MAGIC):])
+    except (OSError, zlib.error):
+        return {}
+    entries: dict[str, CabEntry] = {}
+    offset = 0
+    while offset < len(data):
+        (length,) = struct.unpack_from("<H", data, offset)
+        bundle = data[offset + 2:offset + 2 + length].decode()
+        offset += 2 + length
+        mtime, size, count = struct.unpack_from("<qqH", data, offset)
+        offset += 18
+        cabs = []
+        for _ in range(count):
+            (length,) = struct.unpack_from("<H", data, offset)
+            cabs.append(data[offset + 2:offset + 2 + length].decode())
+            offset += 2 + length
+        entries[bundle] = (mtime, size, cabs)
+    return entries
+
+
+def _write_cab_entries(path: Path, entries: dict[str, CabEntry]) -> None:
+    out = bytearray()
+    for bundle, (mtime, size, cabs) in entries.items():
+        encoded = bundle.encode()
+        out += struct.pack("<H", len(encoded)) + encoded
+        out += struct.pack("<qqH", mtime, size, len(cabs))
+        for cab in cabs:
+            encoded = cab.encode()
+            out += struct.pack("<H", len(encoded)) + encoded
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Replace rather than overwrite, so a reader never sees half a file.
+    temp = path.with_suffix(f".{os.getpid()}.tmp")
+    temp.write_bytes(CAB_INDEX_MAGIC + zlib.compress(bytes(out), 6))
+    os.replace(temp, path)
+
+
 @cache
 def get_cab_index() -> dict[str, str]:
     """Map internal CAB name -> owning bundle, so cross-bundle PPtrs resolve.
 
     Materials reference shared textures (matcap, face masks) that live outside the
-    per-character bundles; without this they silently fail to read.
+    per-character bundles; without this they silently fail to read. The file
+    remembers each bundle's mtime and size, so only bundles that are new or
+    changed since the last run are opened again.
     """
-    if CAB_INDEX_PATH.exists():
-        return json.loads(CAB_INDEX_PATH.read_text())
-    CAB_INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
     # Not get_unity3d_files(): that dedupes by name, dropping patched bundles in
     # Persistent_Store whose CABs differ from their InstallResource counterparts.
-    files = [str(f) for root in (unity_asset_dir_1, unity_asset_dir_2)
-             for f in root.rglob("*.unity3d")]
-    print(f"building CAB index over {len(files)} bundles (one time, ~1 min)...")
+    stats = {str(f): f.stat() for root in (unity_asset_dir_1, unity_asset_dir_2)
+             if root.is_dir() for f in sorted(root.rglob("*.unity3d"))}
+    stored = _read_cab_entries(CAB_INDEX_PATH)
+    entries: dict[str, CabEntry] = {}
+    stale = []
+    for path, stat in stats.items():
+        entry = stored.get(path)
+        if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+            entries[path] = entry
+        else:
+            stale.append(path)
+    if stale:
+        print(f"indexing CABs of {len(stale)} new or changed bundles...")
+        # A patch touches a handful of bundles; only a first run needs the pool.
+        if len(stale) < 64:
+            scanned = [_bundle_cabs(path) for path in stale]
+        else:
+            with ProcessPoolExecutor(max_workers=16) as pool:
+                scanned = list(pool.map(_bundle_cabs, stale, chunksize=16))
+        for path, cabs in scanned:
+            entries[path] = (stats[path].st_mtime_ns, stats[path].st_size, cabs)
+    if stale or len(entries) != len(stored):
+        # Keep the scan order, which decides who owns a CAB two bundles share.
+        _write_cab_entries(CAB_INDEX_PATH, {path: entries[path] for path in stats})
     index: dict[str, str] = {}
-    with ProcessPoolExecutor(max_workers=16) as pool:
-        for path, cabs in pool.map(_bundle_cabs, files, chunksize=16):
-            for cab in cabs:
-                index.setdefault(cab, path)
-    CAB_INDEX_PATH.write_text(json.dumps(index))
-    print(f"indexed {len(index)} CABs")
+    for path in stats:
+        for cab in entries[path][2]:
+            index.setdefault(cab, path)
     return index
 
 
@@ -151,18 +220,21 @@ class GltfBuilder:
         self.root["textures"].append({"sampler": 0, "source": len(self.root["images"]) - 1})
         return len(self.root["textures"]) - 1
 
-    def save(self, path: Path) -> None:
+    def to_bytes(self) -> bytes:
         self._align()
         self.root["buffers"] = [{"byteLength": len(self.buffer)}]
         for key in ("meshes", "skins", "materials", "textures", "images"):
-            if not self.root[key]:
+            if key in self.root and not self.root[key]:
                 del self.root[key]
         js = json.dumps(self.root, separators=(",", ":")).encode()
         js += b" " * ((4 - len(js) % 4) % 4)
         out = struct.pack("<III", 0x46546C67, 2, 28 + len(js) + len(self.buffer))
         out += struct.pack("<II", len(js), 0x4E4F534A) + js
         out += struct.pack("<II", len(self.buffer), 0x004E4942) + bytes(self.buffer)
-        path.write_bytes(out)
+        return out
+
+    def save(self, path: Path) -> None:
+        path.write_bytes(self.to_bytes())
 
 
 def load_externals(env: UnityPy.Environment, loaded: set[str]) -> None:
@@ -649,35 +721,62 @@ def decimate(times: np.ndarray, values: np.ndarray,
     return times[index], values[index]
 
 
+def animation_bundles(char_id: str) -> list[Path]:
+    """The bundles holding a character's clips, `_animations` before `_timeline`.
+
+    The ultra cutscene lives in `_timeline` rather than `_animations`, and it is
+    the clip that emotes most, so both are read.
+    """
+    available = {f.name: f for f in get_unity3d_files()}
+    # Alternate outfits ship a model but no clips of their own; the last digit
+    # is the outfit, and they animate off the default one's bundle.
+    bundles = []
+    for part in ("animations", "timeline"):
+        for candidate in (char_id, f"{char_id[:-1]}1"):
+            name = f"char_{candidate}_{part}.unity3d"
+            if name in available:
+                bundles.append(available[name])
+                break
+    if not bundles:
+        raise FileNotFoundError(f"no animation bundle for char_{char_id}")
+    return bundles
+
+
 class AnimationExporter:
-    def __init__(self, char_id: str) -> None:
-        self.char_id = char_id
-        self.rest, self.shapes = _skeleton_rest_pose(char_id)
-        self.sources = self._load_environments()
+    """Builds a character's clips against the rest pose of its model.
 
-    def _load_environments(self) -> list[tuple[UnityPy.Environment, dict[int, str]]]:
-        """The bundles holding this character's clips, each with its own TOS.
+    `skeleton` and `tables` let a worker skip what the parent already read: the
+    rest pose costs a full model load with externals, and the TOS tables every
+    Avatar in the bundles.
+    """
 
-        The ultra cutscene lives in `_timeline` rather than `_animations`, and it
-        is the clip that emotes most, so both are read. They cannot share an
-        environment: the timeline bundle carries its own rig and avatars, and
-        merging the two path tables would let one rig's hashes resolve against
-        the other's bones.
+    def __init__(self, char_id: str,
+                 bundles: Optional[list[Path]] = None,
+                 skeleton: Optional[tuple[dict[str, dict[str, Any]],
+                                          dict[str, list[str]]]] = None,
+                 tables: Optional[list[dict[int, str]]] = None) -> None:
+        self.char_id = char_id
+        self.bundles = bundles or animation_bundles(char_id)
+        self.rest, self.shapes = skeleton or _skeleton_rest_pose(char_id)
+        self.sources = self._load_environments(tables)
+        # Readers only: an object is not deserialised until its clip is built.
+        self.clip_objects = {(source, obj.path_id): obj
+                             for source, (env, _) in enumerate(self.sources)
+                             for obj in env.objects if obj.type.name == "AnimationClip"}
+
+    def _load_environments(
+            self, tables: Optional[list[dict[int, str]]] = None
+    ) -> list[tuple[UnityPy.Environment, dict[int, str]]]:
+        """Each bundle's environment with its own TOS.
+
+        They cannot share an environment: the timeline bundle carries its own rig
+        and avatars, and merging the two path tables would let one rig's hashes
+        resolve against the other's bones.
         """
-        available = {f.name: f for f in get_unity3d_files()}
-        # Alternate outfits ship a model but no clips of their own; the last digit
-        # is the outfit, and they animate off the default one's bundle.
-        sources = []
-        for part in ("animations", "timeline"):
-            for char_id in (self.char_id, f"{self.char_id[:-1]}1"):
-                name = f"char_{char_id}_{part}.unity3d"
-                if name in available:
-                    env = UnityPy.Environment(str(available[name]))
-                    sources.append((env, self._read_tos(env)))
-                    break
-        if not sources:
-            raise FileNotFoundError(f"no animation bundle for char_{self.char_id}")
-        return sources
+        envs = [UnityPy.Environment(str(path)) for path in self.bundles]
+        if tables is None:
+            tables = [self._read_tos(env) for env in envs]
+        return list(zip(envs, tables))
 
     @staticmethod
     def _read_tos(env: UnityPy.Environment) -> dict[int, str]:
@@ -689,10 +788,36 @@ class AnimationExporter:
                     tos.setdefault(path_hash, path)
         return tos
 
-    def clips(self) -> list[tuple[AnimationClip, dict[int, str]]]:
-        clips = [(o.read(), tos) for env, tos in self.sources
-                 for o in env.objects if o.type.name == "AnimationClip"]
-        return sorted(clips, key=lambda pair: pair[0].m_Name)
+    def clip_refs(self) -> list[tuple[str, int, int]]:
+        """(name, source index, path id) of every clip, sorted by name.
+
+        Only the name is peeked, so nothing is deserialised until a clip is built.
+        """
+        return sorted((obj.peek_name() or "", source, path_id)
+                      for (source, path_id), obj in self.clip_objects.items())
+
+    def read_clip(self, source: int, path_id: int) -> tuple[AnimationClip, dict[int, str]]:
+        return self.clip_objects[source, path_id].read(), self.sources[source][1]
+
+    def clips(self) -> Iterator[tuple[AnimationClip, dict[int, str]]]:
+        """Every clip with its TOS, read one at a time as the caller asks."""
+        for _, source, path_id in self.clip_refs():
+            yield self.read_clip(source, path_id)
+
+    def render(self, source: int, path_id: int) -> Optional[tuple[str, bytes, dict[str, Any]]]:
+        """One clip as (name, .glb bytes, manifest fields), or None if it moves nothing."""
+        clip, tos = self.read_clip(source, path_id)
+        gltf = self.build(clip, tos)
+        if gltf is None:
+            return None
+        info = {
+            "face": any(channel["target"]["path"] == "weights"
+                        for channel in gltf.root["animations"][0]["channels"]),
+            "duration": round(float(clip.m_MuscleClip.m_StopTime
+                                    - clip.m_MuscleClip.m_StartTime), 4),
+            "loop": bool(clip.m_MuscleClip.m_LoopTime),
+        }
+        return clip.m_Name, gltf.to_bytes(), info
 
     def build(self, clip: AnimationClip, tos: dict[int, str]) -> Optional[GltfBuilder]:
         curves = read_curves(clip)
@@ -948,34 +1073,70 @@ def _skeleton_rest_pose(
     return rest, shapes
 
 
-def export_animations(char_id: str, out_dir: Path) -> list[dict[str, Any]]:
+# The animation exporter a per-clip worker builds with, set up once per process.
+_clip_worker: Optional[AnimationExporter] = None
+
+
+def _init_clip_worker(char_id: str, bundles: list[Path],
+                      skeleton: tuple[dict[str, dict[str, Any]], dict[str, list[str]]],
+                      tables: list[dict[int, str]]) -> None:
+    """Rebuild the parent's exporter from the rest pose and TOS it passed in.
+
+    Only the bundles are reopened; reading the skeleton again would mean a full
+    model load with externals in every worker.
+    """
+    global _clip_worker
+    _clip_worker = AnimationExporter(char_id, bundles, skeleton, tables)
+
+
+def _render_clip(ref: tuple[int, int]) -> Optional[tuple[str, bytes, dict[str, Any]]]:
+    return _clip_worker.render(*ref)
+
+
+def _render_parallel(exporter: AnimationExporter, jobs: int
+                     ) -> Iterator[Optional[tuple[str, bytes, dict[str, Any]]]]:
+    """`exporter.render` over every clip, fanned out across `jobs` processes."""
+    refs = [(source, path_id) for _, source, path_id in exporter.clip_refs()]
+    # Each worker gets its own copy of the skeleton and tables once, at start-up.
+    with ProcessPoolExecutor(
+            max_workers=min(jobs, len(refs)) or 1, initializer=_init_clip_worker,
+            initargs=(exporter.char_id, exporter.bundles, (exporter.rest, exporter.shapes),
+                      [tos for _, tos in exporter.sources])) as pool:
+        # map() keeps the sorted order, which the stem de-duplication relies on.
+        yield from pool.map(_render_clip, refs)
+
+
+def export_animations(char_id: str, out_dir: Path,
+                      jobs: Optional[int] = None) -> list[dict[str, Any]]:
+    """Export every clip of a character, `jobs` at once if more than one."""
     exporter = AnimationExporter(char_id)
     clip_dir = out_dir / "anim" / f"char_{char_id}"
     clip_dir.mkdir(parents=True, exist_ok=True)
+    if jobs and jobs > 1:
+        rendered = _render_parallel(exporter, jobs)
+    else:
+        rendered = (exporter.render(source, path_id)
+                    for _, source, path_id in exporter.clip_refs())
     manifest = []
     taken: set[str] = set()
-    for clip, tos in exporter.clips():
-        gltf = exporter.build(clip, tos)
-        if gltf is None:
+    for result in rendered:
+        if result is None:
             continue
+        name, glb, info = result
         # The name comes from the bundle and ends up in a URL, so keep it to
         # characters that need no escaping and cannot walk out of the directory.
-        stem = re.sub(r"[^A-Za-z0-9._-]", "_", clip.m_Name)
+        stem = re.sub(r"[^A-Za-z0-9._-]", "_", name)
         # Two bundles now feed this, and both name a clip `Recorded`.
         while stem in taken:
             stem += "_"
         taken.add(stem)
         path = clip_dir / (stem + ".glb")
-        gltf.save(path)
+        path.write_bytes(glb)
         manifest.append({
-            "name": clip.m_Name,
+            "name": name,
             "file": f"anim/char_{char_id}/{path.name}",
-            "face": any(channel["target"]["path"] == "weights"
-                        for channel in gltf.root["animations"][0]["channels"]),
-            "duration": round(float(clip.m_MuscleClip.m_StopTime
-                                    - clip.m_MuscleClip.m_StartTime), 4),
-            "loop": bool(clip.m_MuscleClip.m_LoopTime),
-            "bytes": path.stat().st_size,
+            **info,
+            "bytes": len(glb),
         })
     (out_dir / f"char_{char_id}.anims.json").write_text(
         json.dumps({"id": char_id, "clips": manifest}, indent=1))
@@ -983,7 +1144,7 @@ def export_animations(char_id: str, out_dir: Path) -> list[dict[str, Any]]:
 
 
 def _export_character(char_id: str, output_root: Path, animations: bool,
-                      overwrite: bool) -> list[str]:
+                      overwrite: bool, clip_jobs: Optional[int] = None) -> list[str]:
     """One character's model and clips, in a worker process. Returns its output."""
     model_path = output_root / f"char_{char_id}.glb"
     lines: list[str] = []
@@ -998,7 +1159,7 @@ def _export_character(char_id: str, output_root: Path, animations: bool,
     if not overwrite and (output_root / f"char_{char_id}.anims.json").exists():
         return lines
     try:
-        manifest = export_animations(char_id, output_root)
+        manifest = export_animations(char_id, output_root, clip_jobs)
     except Exception as exc:
         return lines + [f"char_{char_id} animations: {type(exc).__name__}: {exc}"]
     total = sum(clip["bytes"] for clip in manifest)
@@ -1009,7 +1170,8 @@ def export_3d_models(char_ids: set[str] | None = None,
                      output_root: Path | None = None,
                      animations: bool = True,
                      overwrite: bool = False,
-                     jobs: int | None = None) -> None:
+                     jobs: int | None = None,
+                     clip_jobs: int | None = None) -> None:
     output_root = output_root or model_root
     output_root.mkdir(parents=True, exist_ok=True)
     available = set(available_character_ids())
@@ -1029,7 +1191,7 @@ def export_3d_models(char_ids: set[str] | None = None,
     # accumulate several. A fresh one costs half a second against half a minute.
     workers = min(jobs or max(os.cpu_count() - 4, 4), len(char_ids))
     work = partial(_export_character, output_root=output_root,
-                   animations=animations, overwrite=overwrite)
+                   animations=animations, overwrite=overwrite, clip_jobs=clip_jobs)
     with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=1) as pool:
         for lines in pool.map(work, sorted(char_ids)):
             for line in lines:
@@ -1048,6 +1210,8 @@ def _parse_args() -> argparse.Namespace:
                         help="Re-export even if output already exists")
     parser.add_argument("--jobs", type=int, default=None,
                         help="Characters to export at once (default: cores - 4)")
+    parser.add_argument("--clip-jobs", type=int, default=None,
+                        help="Clips of one character to build at once (default: 1)")
     return parser.parse_args()
 
 
@@ -1057,7 +1221,8 @@ def main() -> None:
                      output_root=args.out,
                      animations=not args.no_animations,
                      overwrite=args.overwrite,
-                     jobs=args.jobs)
+                     jobs=args.jobs,
+                     clip_jobs=args.clip_jobs)
 
 
 if __name__ == "__main__":
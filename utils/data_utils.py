@@ -60,8 +60,8 @@ def load_json_pair(name: str) -> tuple[dict, dict]:
     return f1, f2
 
 
-@cache
-def load_lua_table(file_name: str) -> dict | list | None:
+def lua_path(file_name: str) -> Path | None:
+    """Where a Lua table is on disk, renaming it first if it is still under its hashed name."""
     path = lua_root / file_name
     if not path.exists():
         guess = lua_root / (xxhash.xxh64(file_name).hexdigest().upper() + ".lua")
@@ -69,6 +69,14 @@ def load_lua_table(file_name: str) -> dict | list | None:
             guess.rename(path)
         else:
             return None
+    return path
+
+
+@cache
+def load_lua_table(file_name: str) -> dict | list | None:
+    path = lua_path(file_name)
+    if path is None:
+        return None
     with open(path, "r", encoding='utf-8') as f:
         content = f.read()
     content = content.lstrip("return")
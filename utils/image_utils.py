@@ -0,0 +1,164 @@
+import io
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass
+from functools import cache
+from pathlib import Path
+
+import numpy as np
+import xxhash
+from PIL import Image
+
+IMAGE_INDEX_PATH = Path("assets") / "image_index.json"
+
+
+@dataclass
+class ImageInfo:
+    width: int
+    height: int
+    mode: str
+    # Bounding box of the non-transparent pixels (left, top, right, bottom), None if fully transparent.
+    bbox: list[int] | None
+    hash: str
+    # What the file looked like when it was indexed; a mismatch means it changed since.
+    mtime_ns: int
+    file_size: int
+
+    @property
+    def size(self) -> tuple[int, int]:
+        return self.width, self.height
+
+
+def write_image(image: Image.Image, path: Path) -> ImageInfo:
+    """Save `image` to `path` and describe it, without reading the file back."""
+    buffer = io.BytesIO()
+    image.save(buffer, format=Image.registered_extensions().get(path.suffix.lower(), "PNG"))
+    data = buffer.getvalue()
+    path.write_bytes(data)
+    return _describe(image, data, path)
+
+
+def describe_file(path: Path) -> ImageInfo:
+    """Decode `path` once to describe it; for images written by something other than `write_image`."""
+    data = path.read_bytes()
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        return _describe(image, data, path)
+
+
+def _describe(image: Image.Image, data: bytes, path: Path) -> ImageInfo:
+    bbox = image.getbbox()
+    stat = path.stat()
+    return ImageInfo(
+        image.width, image.height, image.mode,
+        list(bbox) if bbox else None,
+        xxhash.xxh3_64_hexdigest(data),
+        stat.st_mtime_ns, stat.st_size,
+    )
+
+
+def alpha_composite(canvas: np.ndarray, layer: np.ndarray, left: int = 0, top: int = 0) -> None:
+    """Composite the RGBA `layer` onto the RGBA `canvas` in place, its corner at (left, top).
+
+    Only the overlap is blended, so the work scales with the layer rather than the
+    canvas, and parts of the layer outside the canvas are cut off. The blend
+    itself is Pillow's: a fixed-point NumPy port matched it bit for bit but ran
+    about ten times slower.
+    """
+    canvas_h, canvas_w = canvas.shape[:2]
+    layer_h, layer_w = layer.shape[:2]
+    x0, y0 = max(left, 0), max(top, 0)
+    x1, y1 = min(left + layer_w, canvas_w), min(top + layer_h, canvas_h)
+    if x0 >= x1 or y0 >= y1:
+        return
+    src = layer[y0 - top:y1 - top, x0 - left:x1 - left]
+    if not src[..., 3].any():
+        return
+    dst = canvas[y0:y1, x0:x1]
+    dst[...] = np.asarray(Image.alpha_composite(Image.fromarray(dst), Image.fromarray(src)))
+
+
+class ImageIndex:
+    """Metadata of exported images, so consumers never have to open them.
+
+    Exporters `add` what they write; `save` merges the additions into whatever is on
+    disk, so separate exports can share the index.
+    """
+
+    def __init__(self, path: Path = IMAGE_INDEX_PATH):
+        self.path = path
+        self.entries: dict[str, ImageInfo] = self._read()
+        self.added: dict[str, ImageInfo] = {}
+        self.lock = threading.Lock()
+
+    def _read(self) -> dict[str, ImageInfo]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return {k: ImageInfo(**v) for k, v in json.load(f).items()}
+        except (OSError, json.JSONDecodeError, TypeError):
+            print(f"Ignoring unreadable image index {self.path}")
+            return {}
+
+    def add(self, path: Path, info: ImageInfo) -> None:
+        with self.lock:
+            self.entries[path.as_posix()] = info
+            self.added[path.as_posix()] = info
+
+    def drain(self) -> dict[str, ImageInfo]:
+        """Take the additions not yet saved, e.g. to `merge` them into another process' index."""
+        with self.lock:
+            added, self.added = self.added, {}
+            return added
+
+    def merge(self, added: dict[str, ImageInfo]) -> None:
+        with self.lock:
+            self.entries.update(added)
+            self.added.update(added)
+
+    def write(self, image: Image.Image, path: Path) -> ImageInfo:
+        info = write_image(image, path)
+        self.add(path, info)
+        return info
+
+    def get(self, path: Path) -> ImageInfo | None:
+        """Metadata for `path`, or None if it is not indexed or changed since."""
+        info = self.entries.get(path.as_posix())
+        if info is None:
+            return None
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        if (stat.st_mtime_ns, stat.st_size) != (info.mtime_ns, info.file_size):
+            return None
+        return info
+
+    def info(self, path: Path) -> ImageInfo:
+        """Like `get`, but describes and indexes an image that is missing or stale."""
+        info = self.get(path)
+        if info is None:
+            info = describe_file(path)
+            self.add(path, info)
+        return info
+
+    def save(self) -> None:
+        with self.lock:
+            if not self.added:
+                return
+            entries = self._read()
+            entries.update(self.added)
+            self.added.clear()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({k: asdict(v) for k, v in sorted(entries.items())}, f, indent=1)
+            os.replace(tmp, self.path)
+            self.entries.update(entries)
+
+
+@cache
+def image_index() -> ImageIndex:
+    return ImageIndex()
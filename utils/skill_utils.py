@@ -1,7 +1,7 @@
 import re
 from dataclasses import dataclass
 from enum import Enum
-from functools import cache
+from functools import cache, lru_cache
 
 from utils.data_utils import autoload
 
@@ -55,35 +55,37 @@ def get_effects() -> list[Effect]:
     return result
 
 
-def skill_escape_word(o: str) -> str:
-    words = get_words()
+_SKILL_MARKUP = re.compile(
+    r"##(?P<word>[^#]+)#(?P<word_id>\d+)#"
+    r"|<color=(?P<color>#[^>]{3,8})>(?P<colored>[^<]+)</color>"
+    r"|&Param(?P<param>\d+)&"
+)
+_SKILL_MARKUP_NO_WORDS = re.compile(
+    r"<color=(?P<color>#[^>]{3,8})>(?P<colored>[^<]+)</color>"
+    r"|&Param(?P<param>\d+)&"
+)
 
-    def get_word(m: re.Match) -> str:
-        word = m.group(1)
-        word_id = int(m.group(2))
-        if word_id in words:
-            word = words[word_id]
-            return "{{word|" + word.name + "|" + word.icon + "}}"
-        return word
 
-    o, _ = re.subn(r'##([^#]+)#(\d+)#', get_word, o)
-    return o
+def _escape_skill_markup(text: str, escape_word: bool) -> str:
+    pattern = _SKILL_MARKUP if escape_word else _SKILL_MARKUP_NO_WORDS
 
+    def repl(m: re.Match) -> str:
+        if m.lastgroup == "param":
+            return "{" + m.group("param") + "}"
+        if m.lastgroup == "colored":
+            return f"{{{{color|{m.group('color')}|{_escape_skill_markup(m.group('colored'), escape_word)}}}}}"
+        word = get_words().get(int(m.group("word_id")))
+        if word is None:
+            return _escape_skill_markup(m.group("word"), escape_word=False)
+        return "{{word|" + word.name + "|" + word.icon + "}}"
 
-def skill_escape_color(o: str) -> str:
-    o, _ = re.subn(r'<color=(#[^>]{3,8})>([^<]+)</color>',
-                   lambda m: f"{{{{color|{m.group(1)}|{m.group(2)}}}}}",
-                   o)
-    return o
+    return pattern.sub(repl, text)
 
 
+@lru_cache(maxsize=4096)
 def skill_escape(bd, escape_word: bool = True) -> str:
-    bd = bd.replace('\v', ' ')
-    if escape_word:
-        bd = skill_escape_word(bd)
-    bd = skill_escape_color(bd)
-    bd, _ = re.subn(r"&Param(\d+)&", lambda m: "{" + m.group(1) + "}", bd)
-    return bd
+    """Skill description markup as wikitext: words, colors and {n} parameter slots, in one pass."""
+    return _escape_skill_markup(bd.replace('\v', ' '), escape_word)
 
 
 class SkillParamType(Enum):
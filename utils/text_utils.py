@@ -1,18 +1,11 @@
 import re
+from functools import cache, lru_cache
 
 
 COLOR_LIGHTEN_AMOUNT = 0.45
 
 
-def _escape_ruby_markup(text: str) -> str:
-    def repl(match: re.Match[str]) -> str:
-        top_text = match.group(1)
-        main_text = match.group(2)
-        return f"{{{{Ruby|{main_text}|{top_text}}}}}"
-
-    return re.subn(r"<r=([^>]*)>(.*?)</r>", repl, text)[0]
-
-
+@cache
 def _lighten_color(color: str) -> str:
     if not color.startswith("#"):
         return color
@@ -37,81 +30,138 @@ def _lighten_color(color: str) -> str:
     return f"#{lightened[0]:02x}{lightened[1]:02x}{lightened[2]:02x}{alpha.lower()}"
 
 
-def _escape_color_markup(text: str) -> str:
-    parts: list[str] = []
-    last_end = 0
-    open_colors = 0
-
-    for match in re.finditer(r"<color=(#[0-9A-Fa-f]{3,8}|[A-Za-z]+)>|</color>", text):
-        parts.append(text[last_end:match.start()])
-        if match.group(1) is None:
-            if open_colors:
-                parts.append("</span>")
-                open_colors -= 1
-        else:
-            color = _lighten_color(match.group(1).strip())
-            parts.append(f'<span style="color:{color}">')
-            open_colors += 1
-        last_end = match.end()
-
-    parts.append(text[last_end:])
-    parts.extend("</span>" for _ in range(open_colors))
-    return "".join(parts)
-
-
-def _escape_align_markup(text: str) -> str:
-    parts: list[str] = []
-    last_end = 0
-    open_aligns = 0
-
-    for match in re.finditer(r'<align\s*=\s*"?(right)"?>|</align>', text):
-        parts.append(text[last_end:match.start()])
-        if match.group(1) is None:
-            if open_aligns:
-                parts.append("</div>")
-                open_aligns -= 1
-        else:
-            parts.append('<div style="text-align:right">')
-            open_aligns += 1
-        last_end = match.end()
-
-    parts.append(text[last_end:])
-    parts.extend("</div>" for _ in range(open_aligns))
-    return "".join(parts)
-
-
+_SIZE = re.compile(r"</?size(?:\s*=\s*[^>]*)?>")
+_MARKUP = re.compile(
+    # The lookahead lets the scan skip ordinary text without trying every alternative.
+    r"(?=[<=\n~\\\d])(?:"
+    r"<r=(?P<ruby_top>[^>]*)>(?P<ruby_main>.*?)</r>"
+    r"|<color=(?P<color>#[0-9A-Fa-f]{3,8}|[A-Za-z]+)>"
+    r"|(?P<color_end></color>)"
+    r'|<align\s*=\s*"?(?P<align>right)"?>'
+    r"|(?P<align_end></align>)"
+    r"|==(?P<placeholder>RT|PLAYER_NAME|W|B|A-1|P)=="
+    r"|(?P<newline>\n)"
+    r"|(?P<raw>[~\\\d]+)"
+    r"|(?P<equals>=)"
+    r")"
+)
+_PLACEHOLDERS = {
+    "RT": "<br/>",
+    "PLAYER_NAME": "<username>",
+    "W": "",
+    "B": "",
+    "A-1": "",
+    "P": "",
+}
+# Text without any of these has nothing to escape.
+_MARKUP_CHARS = re.compile(r"[<=~\\\n]")
+_TILDES = re.compile(r"~~(?=~)")
+_BYTE_ESCAPE_3 = re.compile(r'\\(\d{1,3})\\(\d{1,3})\\(\d{1,3})')
+_BYTE_ESCAPE_2 = re.compile(r'\\(\d{1,3})\\(\d{1,3})')
+
+
+def _decode_byte_escape(m: re.Match[str]) -> str:
+    try:
+        return bytes(int(x) for x in m.groups()).decode('utf-8')
+    except (ValueError, UnicodeDecodeError):
+        return m.group(0)
+
+
+def _escape_raw_run(run: str) -> str:
+    # A run of three or more tildes would be wiki markup, so break it up every two.
+    if "~~~" in run:
+        run = _TILDES.sub("~~<nowiki/>", run)
+    if "\\" in run:
+        # Three-byte sequences are tiled from the left first, then pairs in what is left.
+        run = _BYTE_ESCAPE_3.sub(_decode_byte_escape, run)
+        run = _BYTE_ESCAPE_2.sub(_decode_byte_escape, run)
+        run = run.replace("=", "{{=}}")
+    return run
+
+
+class _MarkupWriter:
+    """Output of one `escape_text` call, plus the tags it still has to close."""
+
+    __slots__ = ("parts", "raw", "open_colors", "open_aligns")
+
+    def __init__(self):
+        self.parts: list[str] = []
+        self.raw = ""
+        self.open_colors = 0
+        self.open_aligns = 0
+
+    def emit(self, text: str) -> None:
+        # Tildes, backslashes and digits are held back until something visible
+        # follows: markup that renders as nothing does not separate them, so they
+        # can still combine into tilde runs and escaped bytes.
+        if self.raw:
+            self.parts.append(_escape_raw_run(self.raw))
+            self.raw = ""
+        self.parts.append(text)
+
+    def write(self, text: str) -> None:
+        if _MARKUP_CHARS.search(text) is None:
+            self.emit(text)
+            return
+        last_end = 0
+        for match in _MARKUP.finditer(text):
+            if match.start() > last_end:
+                self.emit(text[last_end:match.start()])
+            last_end = match.end()
+            kind = match.lastgroup
+            if kind == "equals":
+                self.emit("{{=}}")
+            elif kind == "raw":
+                self.raw += match.group("raw")
+            elif kind == "placeholder":
+                replacement = _PLACEHOLDERS[match.group("placeholder")]
+                if replacement:
+                    self.emit(replacement)
+            elif kind == "newline":
+                self.emit("<br/>")
+            elif kind == "ruby_main":
+                self.emit("{{Ruby|")
+                self.write(match.group("ruby_main"))
+                self.emit("|")
+                self.write(match.group("ruby_top"))
+                self.emit("}}")
+            elif kind == "color":
+                self.emit(f'<span style{{{{=}}}}"color:{_lighten_color(match.group("color"))}">')
+                self.open_colors += 1
+            elif kind == "color_end":
+                if self.open_colors:
+                    self.emit("</span>")
+                    self.open_colors -= 1
+            elif kind == "align":
+                self.emit('<div style{{=}}"text-align:right">')
+                self.open_aligns += 1
+            elif kind == "align_end":
+                if self.open_aligns:
+                    self.emit("</div>")
+                    self.open_aligns -= 1
+        if last_end < len(text):
+            self.emit(text[last_end:])
+
+    def finish(self) -> str:
+        self.emit("</span>" * self.open_colors + "</div>" * self.open_aligns)
+        return "".join(self.parts)
+
+
+@lru_cache(maxsize=1 << 16)
 def escape_text(text: str) -> str:
-    text = re.subn(r"</?size(?:\s*=\s*[^>]*)?>", "", text)[0]
-    text = _escape_ruby_markup(text)
-    text = _escape_color_markup(text)
-    text = _escape_align_markup(text)
-    text = (text
-            .replace("==RT==", "\n")
-            .replace("\n", "<br/>")
-            .replace("==PLAYER_NAME==", "<username>")
-            .replace("==W==", "")
-            .replace("==B==", "")
-            .replace("==A-1==", "")
-            .replace("==P==", ""))
-    text = re.subn("~~(?=~)", "~~<nowiki/>", text)[0]
-    def repl(m: re.Match[str]) -> str:
-        try:
-            return bytes(int(x) for x in m.groups()).decode('utf-8')
-        except (ValueError, UnicodeDecodeError):
-            return m.group(0)
-
-    text = re.subn(
-        r'\\(\d{1,3})\\(\d{1,3})\\(\d{1,3})',
-        repl,
-        text
-    )[0]
-    text = re.subn(
-        r'\\(\d{1,3})\\(\d{1,3})',
-        repl,
-        text
-    )[0]
-    text = text.replace("=", "{{=}}")
-    return text.strip()
+    """Unity rich text and game placeholders as wikitext, in one scan of `text`.
+
+    Size tags are dropped up front; then handles ruby, color (lightened) and right-align tags, line breaks,
+    the player name and other placeholders, runs of tildes, escaped UTF-8 bytes and
+    `=`, which becomes {{=}} everywhere including in the generated markup.
+    """
+    if _MARKUP_CHARS.search(text) is None:
+        return text.strip()
+    if "size" in text:
+        text = _SIZE.sub("", text)
+    writer = _MarkupWriter()
+    writer.write(text)
+    return writer.finish().strip()
 
 
 def main():
@@ -13,13 +13,14 @@ from utils.wiki_utils import s
 def upload_file(text: str, target: FilePage, summary: str = "batch upload file",
                 file: str | Path | Callable[[], Path] = None, url: str = None, force: bool = False,
                 ignore_dup: bool = False, redirect_dup: bool = False, move_dup: bool = True):
+    if callable(file):
+        # Produce the file before the retry loop, so a failure to produce it is not mistaken for an upload error.
+        file = file()
     while True:
         try:
             if url is not None:
                 Uploader(s, target, source_url=url, text=text, comment=summary, ignore_warnings=force).upload()
             if file is not None:
-                if callable(file):
-                    file = file()
                 Uploader(s, target, source_filename=str(file), text=text, comment=summary,
                          ignore_warnings=force).upload()
             return
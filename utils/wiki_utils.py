@@ -1,14 +1,20 @@
 import dataclasses
 import enum
 import json
+import os
+from functools import cache
+from pathlib import Path
 from typing import Any
 
+import xxhash
 from pywikibot import Site, Page
 from pywikibot.pagegenerators import PreloadingGenerator
 from wikitextparser import WikiText, Template, Section
 
 s = Site()
 
+PUBLISHED_PAGES_PATH = Path("assets") / "published_pages.json"
+
 
 def find_section(wikitext: WikiText, title: str) -> Section | None:
     for sec in wikitext.sections:
@@ -48,6 +54,57 @@ def save_page(page: Page | str, text: str, summary: str = "update page"):
         page.save(summary=summary)
 
 
+class PublishedPages:
+    """Hash of the wikitext last published to each page, so re-publishing an unchanged
+    render can be skipped without asking the wiki for the page.
+
+    Edits made on the wiki itself are not noticed; delete the file to compare every
+    page against the wiki again.
+    """
+
+    def __init__(self, path: Path = PUBLISHED_PAGES_PATH):
+        self.path = path
+        self.hashes: dict[str, str] = self._read()
+        self.changed = False
+
+    def _read(self) -> dict[str, str]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            print(f"Ignoring unreadable published page hashes {self.path}")
+            return {}
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        # save_page ignores surrounding whitespace, so the hash does too.
+        return xxhash.xxh3_64_hexdigest(text.strip().encode("utf-8"))
+
+    def is_current(self, title: str, text: str) -> bool:
+        return self.hashes.get(title) == self.text_hash(text)
+
+    def record(self, title: str, text: str) -> None:
+        self.hashes[title] = self.text_hash(text)
+        self.changed = True
+
+    def save(self) -> None:
+        if not self.changed:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.hashes, f, indent=1, sort_keys=True, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        self.changed = False
+
+
+@cache
+def published_pages() -> PublishedPages:
+    return PublishedPages()
+
+
 def dump_json(obj):
     class EnhancedJSONEncoder(json.JSONEncoder):
         def default(self, o):